@@ -0,0 +1,17 @@
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, который берёт токен и пользователя из кэша
+    и обращается к базе только при промахе.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token)
+        return token.user, token
@@ -0,0 +1,177 @@
+import sqlite3
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from foodgram.models import Favorite, Recipe, ShoppingList, Subscription
+
+from .cache import user_membership
+from .counters import update_favorites_counts, update_followers_counts
+from .feed import backfill_feed_many, remove_many_from_feed
+from .shopping_list import update_cart_totals_many
+
+User = get_user_model()
+
+MAX_IDS = 100
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+ABSENT = 'absent'
+NOT_FOUND = 'not_found'
+SELF = 'self'
+
+DELETE_SQL = '''
+    DELETE FROM {table}
+    WHERE user_id = %s AND {column} IN ({ids})
+'''
+
+INSERT_SQL = '''
+    INSERT INTO {table} (user_id, {column})
+    VALUES {values}
+    ON CONFLICT DO NOTHING
+    {returning}
+'''
+
+
+def delete_rows(model, column, user_id, ids):
+    """
+    Удаляет строки пользователя одним запросом. Сигналы post_delete
+    не отправляются: вызывающий код обновляет производные данные сам.
+    """
+    sql = DELETE_SQL.format(
+        table=model._meta.db_table,
+        column=column,
+        ids=', '.join(['%s'] * len(ids))
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, *ids])
+
+
+def collect_results(ids, statuses):
+    return [{'id': pk, 'status': statuses[pk]} for pk in ids]
+
+
+def can_return_inserted():
+    return (connection.vendor != 'sqlite'
+            or sqlite3.sqlite_version_info >= (3, 35, 0))
+
+
+def insert_rows(model, column, user_id, ids):
+    """
+    Вставляет строки пользователя, пропуская уже существующие,
+    и возвращает множество id, для которых строка действительно
+    создана этим запросом. Строку, вставленную параллельно, другой
+    запрос не посчитает добавленной.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if not can_return_inserted():
+            inserted = set()
+            sql = INSERT_SQL.format(
+                table=table,
+                column=column,
+                values='(%s, %s)',
+                returning=''
+            )
+            for pk in ids:
+                cursor.execute(sql, [user_id, pk])
+                if cursor.rowcount:
+                    inserted.add(pk)
+            return inserted
+        sql = INSERT_SQL.format(
+            table=table,
+            column=column,
+            values=', '.join(['(%s, %s)'] * len(ids)),
+            returning=f'RETURNING {column}'
+        )
+        cursor.execute(sql, [value for pk in ids for value in (user_id, pk)])
+        return {pk for pk, in cursor.fetchall()}
+
+
+def add_links(model, field, user, ids, found):
+    """
+    Создаёт недостающие связи пользователя с объектами из found
+    одним запросом и возвращает id добавленных и статусы всех ids.
+    """
+    candidates = [pk for pk in ids if pk in found]
+    inserted = set()
+    if candidates:
+        inserted = insert_rows(model, f'{field}_id', user.id, candidates)
+    added = [pk for pk in candidates if pk in inserted]
+    statuses = dict.fromkeys(ids, NOT_FOUND)
+    statuses.update(dict.fromkeys(candidates, EXISTS))
+    statuses.update(dict.fromkeys(added, ADDED))
+    return added, statuses
+
+
+def remove_links(model, field, user, ids):
+    """
+    Удаляет связи пользователя с объектами ids одним запросом
+    и возвращает id удалённых и статусы всех ids.
+    """
+    removed = list(model.objects.select_for_update().filter(
+        user=user,
+        **{f'{field}__in': ids}
+    ).values_list(field, flat=True))
+    if removed:
+        delete_rows(model, f'{field}_id', user.id, removed)
+    statuses = dict.fromkeys(ids, ABSENT)
+    statuses.update(dict.fromkeys(removed, REMOVED))
+    return removed, statuses
+
+
+def add_recipes(model, user, ids):
+    """
+    Добавляет рецепты в избранное (Favorite) или корзину (ShoppingList)
+    и обновляет то же, что обработчики post_save для одиночных записей.
+    """
+    found = set(Recipe.objects.filter(
+        id__in=ids
+    ).values_list('id', flat=True))
+    with transaction.atomic():
+        added, statuses = add_links(model, 'recipe', user, ids, found)
+        if added:
+            if model is Favorite:
+                update_favorites_counts(added, 1)
+            elif model is ShoppingList:
+                update_cart_totals_many(added, 1, user.id)
+            user_membership.invalidate(user.id)
+    return collect_results(ids, statuses)
+
+
+def remove_recipes(model, user, ids):
+    with transaction.atomic():
+        removed, statuses = remove_links(model, 'recipe', user, ids)
+        if removed:
+            if model is Favorite:
+                update_favorites_counts(removed, -1)
+            elif model is ShoppingList:
+                update_cart_totals_many(removed, -1, user.id)
+            user_membership.invalidate(user.id)
+    return collect_results(ids, statuses)
+
+
+def add_subscriptions(user, ids):
+    found = set(User.objects.filter(
+        id__in=ids
+    ).exclude(id=user.id).values_list('id', flat=True))
+    with transaction.atomic():
+        added, statuses = add_links(Subscription, 'author', user, ids, found)
+        if user.id in statuses:
+            statuses[user.id] = SELF
+        if added:
+            update_followers_counts(added, 1)
+            backfill_feed_many(user.id, added)
+            user_membership.invalidate(user.id)
+    return collect_results(ids, statuses)
+
+
+def remove_subscriptions(user, ids):
+    with transaction.atomic():
+        removed, statuses = remove_links(Subscription, 'author', user, ids)
+        if removed:
+            update_followers_counts(removed, -1)
+            remove_many_from_feed(user.id, removed)
+            user_membership.invalidate(user.id)
+    return collect_results(ids, statuses)
@@ -0,0 +1,578 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import FileResponse, HttpResponse
+
+from foodgram.models import Favorite, ShoppingList, Subscription, Tag
+
+Membership = namedtuple(
+    'Membership',
+    ('favorites', 'shopping_cart', 'subscriptions')
+)
+
+EMPTY_MEMBERSHIP = Membership(frozenset(), frozenset(), frozenset())
+
+
+class RecipeFragmentCache:
+    """
+    Кэш независимой от пользователя части представления рецепта.
+
+    Флаги is_favorited, is_in_shopping_cart и author.is_subscribed
+    в фрагмент не входят и подставляются при формировании ответа.
+    """
+    key_prefix = 'recipe-fragment'
+    stats_key_prefix = 'recipe-fragment-stats'
+    stats_names = ('hits', 'misses')
+    timeout = 60 * 60
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, pk):
+        return f'{self.key_prefix}:{pk}'
+
+    def get_many(self, pks):
+        keys = {self.make_key(pk): pk for pk in pks}
+        found = self.cache.get_many(keys)
+        self.record(hits=len(found), misses=len(keys) - len(found))
+        return {keys[key]: fragment for key, fragment in found.items()}
+
+    def set_many(self, fragments):
+        self.cache.set_many({
+            self.make_key(pk): fragment for pk, fragment in fragments.items()
+        }, self.timeout)
+
+    def delete_many(self, pks):
+        self.cache.delete_many([self.make_key(pk) for pk in pks])
+
+    def make_stats_key(self, name):
+        return f'{self.stats_key_prefix}:{name}'
+
+    def record(self, **counters):
+        for name, value in counters.items():
+            if not value:
+                continue
+            key = self.make_stats_key(name)
+            self.cache.add(key, 0, None)
+            try:
+                self.cache.incr(key, value)
+            except ValueError:
+                self.cache.set(key, value, None)
+
+    def stats(self):
+        keys = {self.make_stats_key(name): name for name in self.stats_names}
+        found = self.cache.get_many(keys)
+        return {name: found.get(key, 0) for key, name in keys.items()}
+
+
+recipe_cache = RecipeFragmentCache()
+
+
+class UserMembershipCache:
+    """
+    Кэш множеств id избранных рецептов, рецептов в корзине
+    и авторов, на которых подписан пользователь.
+    """
+    key_prefix = 'user-membership'
+    timeout = 60 * 60
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, user_id):
+        return f'{self.key_prefix}:{user_id}'
+
+    def load(self, user_id):
+        return Membership(
+            favorites=frozenset(Favorite.objects.filter(
+                user=user_id
+            ).values_list('recipe_id', flat=True)),
+            shopping_cart=frozenset(ShoppingList.objects.filter(
+                user=user_id
+            ).values_list('recipe_id', flat=True)),
+            subscriptions=frozenset(Subscription.objects.filter(
+                user=user_id
+            ).values_list('author_id', flat=True))
+        )
+
+    def get(self, user):
+        if user.is_anonymous:
+            return EMPTY_MEMBERSHIP
+        key = self.make_key(user.pk)
+        membership = self.cache.get(key)
+        if membership is None:
+            membership = self.load(user.pk)
+            self.cache.set(key, membership, self.timeout)
+        return membership
+
+    def for_request(self, request):
+        membership = getattr(request, 'membership', None)
+        if membership is None:
+            membership = self.get(request.user)
+            request.membership = membership
+        return membership
+
+    def delete(self, user_id):
+        self.cache.delete(self.make_key(user_id))
+
+    def reset(self, user_id):
+        self.delete(user_id)
+        data_versions.bump(self.make_key(user_id))
+
+    def invalidate(self, user_id):
+        """
+        Сбрасывает множества пользователя и версию его данных.
+
+        Внутри транзакции сброс повторяется после фиксации: иначе
+        параллельный запрос, прочитавший данные до фиксации, вернул бы
+        в кэш старые множества на весь таймаут.
+        """
+        self.reset(user_id)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self.reset(user_id))
+
+
+user_membership = UserMembershipCache()
+
+
+class DataVersionCache:
+    """
+    Версии наборов данных для валидатора ETag.
+
+    Версия равна времени последнего изменения в микросекундах,
+    поэтому после вытеснения из кэша она не повторяет прежние значения.
+    """
+    key_prefix = 'data-version'
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, name):
+        return f'{self.key_prefix}:{name}'
+
+    def get_many(self, names):
+        keys = {self.make_key(name): name for name in names}
+        found = self.cache.get_many(keys)
+        versions = {}
+        for key, name in keys.items():
+            if key not in found:
+                self.cache.add(key, time.time_ns() // 1000, None)
+                found[key] = self.cache.get(key)
+            versions[name] = found[key]
+        return versions
+
+    def bump(self, *names):
+        version = time.time_ns() // 1000
+        self.cache.set_many(
+            {self.make_key(name): version for name in names},
+            None
+        )
+
+
+data_versions = DataVersionCache()
+
+
+class TagSlugCache:
+    """
+    Соответствие slug тега его id.
+
+    Ключ включает версию данных 'tags', поэтому после изменения тегов
+    соответствие строится заново одним запросом.
+    """
+    key_prefix = 'tag-slugs'
+    version_name = 'tags'
+    timeout = 60 * 60 * 24
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, version):
+        return f'{self.key_prefix}:{version}'
+
+    def get_map(self):
+        version = data_versions.get_many([self.version_name])[
+            self.version_name
+        ]
+        key = self.make_key(version)
+        slugs = self.cache.get(key)
+        if slugs is None:
+            slugs = dict(Tag.objects.values_list('slug', 'id'))
+            self.cache.set(key, slugs, self.timeout)
+        return slugs
+
+    def get_ids(self, slugs):
+        slug_map = self.get_map()
+        return [slug_map[slug] for slug in slugs if slug in slug_map]
+
+
+tag_slugs = TagSlugCache()
+
+
+class TagCountCache:
+    """
+    Количество рецептов по тегам для анонимных запросов.
+
+    Ключ строится по параметрам фильтра и версиям данных 'recipes'
+    и 'tags', поэтому записи устаревают вместе с данными.
+    """
+    key_prefix = 'tag-counts'
+    version_names = ('recipes', 'tags')
+    timeout = 60 * 60
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, params):
+        signature = json.dumps(
+            [params, data_versions.get_many(self.version_names)],
+            sort_keys=True
+        )
+        digest = hashlib.md5(signature.encode()).hexdigest()
+        return f'{self.key_prefix}:{digest}'
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, counts):
+        self.cache.set(key, counts, self.timeout)
+
+
+tag_count_cache = TagCountCache()
+
+
+def compress(content):
+    """
+    gzip.compress с нулевым временем в заголовке, чтобы одинаковое
+    содержимое давало одинаковые байты; параметр mtime у gzip.compress
+    есть только с Python 3.8.
+    """
+    output = io.BytesIO()
+    with gzip.GzipFile(fileobj=output, mode='wb', mtime=0) as archive:
+        archive.write(content)
+    return output.getvalue()
+
+
+class RenderedResponseCache:
+    """
+    Кэш отрендеренных ответов справочников вместе со сжатым вариантом.
+
+    Ключ включает версии данных, поэтому устаревшие записи
+    не удаляются явно, а вытесняются по таймауту.
+    """
+    key_prefix = 'rendered-response'
+    timeout = 60 * 60 * 24
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, path, renderer_format, versions):
+        version = ':'.join(str(versions[name]) for name in sorted(versions))
+        return f'{self.key_prefix}:{path}:{renderer_format}:{version}'
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, content_type, content):
+        compressed = compress(content)
+        entry = {
+            'content_type': content_type,
+            'identity': content,
+            'gzip': compressed if len(compressed) < len(content) else None,
+        }
+        self.cache.set(key, entry, self.timeout)
+        return entry
+
+
+rendered_responses = RenderedResponseCache()
+
+
+class DocumentCache:
+    """
+    Файлы сформированных списков покупок на диске, адресуемые по хэшу
+    содержимого. При превышении лимита размера удаляются файлы,
+    к которым дольше всего не обращались.
+    """
+
+    @property
+    def directory(self):
+        return settings.SHOPPING_LIST_CACHE_DIR
+
+    @property
+    def max_bytes(self):
+        return settings.SHOPPING_LIST_CACHE_MAX_BYTES
+
+    def make_key(self, *parts):
+        data = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    @property
+    def tmp_max_age(self):
+        return settings.SHOPPING_LIST_CACHE_TMP_MAX_AGE
+
+    def make_name(self, key, extension):
+        return f'{key}.{extension}'
+
+    def make_path(self, key, extension):
+        return os.path.join(self.directory, self.make_name(key, extension))
+
+    def open(self, key, extension):
+        """
+        Открывает готовый файл и обновляет время обращения к нему.
+        Файлы открываются по дескриптору, чтобы ответ не обращался
+        к ним по имени.
+        Если файл успели удалить при очистке другого процесса,
+        возвращает None, и документ формируется заново.
+        """
+        path = self.make_path(key, extension)
+        try:
+            document = os.fdopen(os.open(path, os.O_RDONLY), 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            document.close()
+            return None
+        return document
+
+    def put(self, key, extension, write):
+        """
+        Записывает документ и возвращает открытый на чтение файл.
+        Файл не переоткрывается по имени: другой процесс может удалить
+        его при очистке сразу после переименования.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.make_path(key, extension)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        document = os.fdopen(
+            os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_EXCL),
+            'w+b'
+        )
+        try:
+            write(document)
+            document.flush()
+            os.replace(tmp_path, path)
+        except BaseException:
+            document.close()
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        document.seek(0)
+        self.evict(keep=path)
+        return document
+
+    def scan(self, keep=None):
+        """
+        Возвращает (время обращения, размер, путь) готовых файлов,
+        кроме keep, и удаляет временные файлы старше
+        SHOPPING_LIST_CACHE_TMP_MAX_AGE, брошенные упавшими процессами.
+        """
+        entries = []
+        stale_before = time.time() - self.tmp_max_age
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.path == keep or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if not entry.name.endswith('.tmp'):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                elif stat.st_mtime < stale_before:
+                    self.remove(entry.path)
+        return entries
+
+    def evict(self, keep=None):
+        entries = self.scan(keep)
+        total = sum(size for _, size, _ in entries)
+        if keep is not None:
+            try:
+                total += os.path.getsize(keep)
+            except FileNotFoundError:
+                pass
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def response(self, document, key, extension, filename, content_type):
+        prefix = settings.SHOPPING_LIST_ACCEL_REDIRECT
+        if not prefix:
+            response = FileResponse(
+                document,
+                as_attachment=True,
+                filename=filename,
+                content_type=content_type
+            )
+            response['Content-Length'] = os.fstat(document.fileno()).st_size
+            return response
+        document.close()
+        response = HttpResponse(content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="{filename}"'
+        )
+        response['X-Accel-Redirect'] = (
+            prefix + self.make_name(key, extension)
+        )
+        return response
+
+
+shopping_list_documents = DocumentCache()
+
+
+class TokenCache:
+    """
+    Токены авторизации вместе с пользователями.
+
+    Записи хранятся в общем кэше TOKEN_CACHE_ALIAS и в ограниченном
+    LRU-словаре процесса с коротким таймаутом. Отзыв токена оставляет
+    в общем кэше отметку, которую проверяет каждое обращение, в том
+    числе к локальной записи, поэтому отозванный токен сразу перестаёт
+    действовать во всех процессах. Без TOKEN_CACHE_ALIAS токены
+    не кэшируются.
+    """
+    key_prefix = 'auth-token'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    @property
+    def max_size(self):
+        return settings.TOKEN_CACHE_SIZE
+
+    @property
+    def timeout(self):
+        return settings.TOKEN_CACHE_TIMEOUT
+
+    @property
+    def cache(self):
+        alias = settings.TOKEN_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def make_key(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return f'{self.key_prefix}:{digest}'
+
+    def make_revoked_key(self, key):
+        return f'{self.make_key(key)}:revoked'
+
+    def is_revoked(self, key):
+        return self.cache.get(self.make_revoked_key(key)) is not None
+
+    def get_local(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, token = entry
+            if expires > now:
+                self.entries.move_to_end(key)
+                return token
+            del self.entries[key]
+        return None
+
+    def get(self, key):
+        if self.cache is None:
+            return None
+        token = self.get_local(key)
+        if token is not None:
+            if not self.is_revoked(key):
+                return token
+            with self.lock:
+                self.entries.pop(key, None)
+            return None
+        entry_key = self.make_key(key)
+        revoked_key = self.make_revoked_key(key)
+        values = self.cache.get_many([entry_key, revoked_key])
+        token = values.get(entry_key)
+        if token is None or revoked_key in values:
+            return None
+        self.remember(key, token)
+        return token
+
+    def set(self, key, token):
+        if self.cache is None or self.is_revoked(key):
+            return
+        self.cache.set(self.make_key(key), token, self.timeout)
+        self.remember(key, token)
+
+    def remember(self, key, token):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.timeout, token)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        """
+        Отзывает токены. Отметка живёт дольше записей, чтобы запись,
+        записанная процессом, прочитавшим токен из базы до отзыва,
+        всё равно отклонялась.
+        """
+        keys = list(keys)
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+        if self.cache is None or not keys:
+            return
+        self.cache.set_many(
+            {self.make_revoked_key(key): True for key in keys},
+            2 * self.timeout
+        )
+        self.cache.delete_many([self.make_key(key) for key in keys])
+
+    def clear(self):
+        """Забывает токены процесса в обоих слоях, не отзывая их."""
+        with self.lock:
+            keys = list(self.entries)
+            self.entries.clear()
+        if self.cache is not None and keys:
+            self.cache.delete_many([self.make_key(key) for key in keys])
+
+
+token_cache = TokenCache()
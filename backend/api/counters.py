@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.db.models import BooleanField, Case, Count, F, Value, When
+
+from foodgram.models import Favorite, Recipe, Subscription, UserCounters
+
+from .cache import data_versions
+
+FAVORITES_VERSION = 'favorites'
+
+
+def get_favorites_version_name(recipe_id):
+    return f'{FAVORITES_VERSION}:{recipe_id}'
+
+
+def bump_favorites_versions(recipe_ids):
+    """
+    Сбрасывает версии счётчиков избранного: общую для списков рецептов
+    и собственные версии рецептов recipe_ids для их страниц.
+    """
+    data_versions.bump(
+        FAVORITES_VERSION,
+        *(get_favorites_version_name(pk) for pk in recipe_ids)
+    )
+
+
+def create_user_counters(user_ids):
+    """
+    Создаёт недостающие строки счётчиков. Нужна там, где пользователи
+    создаются без сигнала post_save, например через bulk_create.
+    """
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True
+    )
+
+
+def get_feed_paused(followers):
+    """
+    Новое значение feed_paused при изменении числа подписчиков
+    на followers: автор, у которого их становится больше
+    FEED_FANOUT_MAX_FOLLOWERS, переводится на подмешивание рецептов
+    в ленты при чтении. Снимает признак только resume_fan_out.
+    """
+    if followers <= 0:
+        return F('feed_paused')
+    return Case(
+        When(
+            followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS - followers,
+            then=Value(True)
+        ),
+        default=F('feed_paused'),
+        output_field=BooleanField()
+    )
+
+
+def update_user_counters(user_id, recipes=0, followers=0):
+    UserCounters.objects.filter(user=user_id).update(
+        recipes_count=F('recipes_count') + recipes,
+        followers_count=F('followers_count') + followers,
+        feed_paused=get_feed_paused(followers)
+    )
+
+
+def update_favorites_count(recipe_id, delta):
+    update_favorites_counts([recipe_id], delta)
+
+
+def update_followers_counts(user_ids, delta):
+    UserCounters.objects.filter(user__in=user_ids).update(
+        followers_count=F('followers_count') + delta,
+        feed_paused=get_feed_paused(delta)
+    )
+
+
+def update_favorites_counts(recipe_ids, delta):
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        favorites_count=F('favorites_count') + delta
+    )
+    bump_favorites_versions(recipe_ids)
+
+
+def compute_user_counters():
+    recipes = Recipe.objects.values('author').annotate(
+        count=Count('id')
+    ).order_by().values_list('author', 'count')
+    followers = Subscription.objects.values('author').annotate(
+        count=Count('id')
+    ).order_by().values_list('author', 'count')
+    counters = {}
+    for user_id, count in recipes:
+        counters[user_id] = (count, 0)
+    for user_id, count in followers:
+        counters[user_id] = (counters.get(user_id, (0, 0))[0], count)
+    return counters
+
+
+def compute_favorites_counts():
+    return dict(Favorite.objects.values('recipe').annotate(
+        count=Count('id')
+    ).order_by().values_list('recipe', 'count'))
@@ -0,0 +1,288 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from rest_framework.exceptions import ValidationError
+
+from foodgram.models import FeedEntry, Recipe, Subscription, UserCounters
+
+User = get_user_model()
+
+FAN_OUT_SQL = '''
+    INSERT INTO {feed} (user_id, recipe_id)
+    SELECT subscription.user_id, %s
+    FROM {subscriptions} subscription
+    WHERE subscription.author_id = %s
+    ON CONFLICT (user_id, recipe_id) DO NOTHING
+'''
+
+FAN_OUT_MANY_SQL = '''
+    INSERT INTO {feed} (user_id, recipe_id)
+    SELECT subscription.user_id, recipe.id
+    FROM {recipes} recipe
+    INNER JOIN {subscriptions} subscription
+        ON subscription.author_id = recipe.author_id
+    WHERE recipe.id IN ({recipe_ids})
+      AND recipe.author_id NOT IN (
+          SELECT counters.user_id
+          FROM {counters} counters
+          WHERE counters.feed_paused = %s
+      )
+    ON CONFLICT (user_id, recipe_id) DO NOTHING
+'''
+
+BACKFILL_SQL = '''
+    INSERT INTO {feed} (user_id, recipe_id)
+    SELECT %s, recipe.id
+    FROM {recipes} recipe
+    WHERE recipe.author_id = %s
+    ORDER BY recipe.id DESC
+    LIMIT %s
+    ON CONFLICT (user_id, recipe_id) DO NOTHING
+'''
+
+BACKFILL_MANY_SQL = '''
+    INSERT INTO {feed} (user_id, recipe_id)
+    SELECT %s, ranked.id
+    FROM (
+        SELECT recipe.id,
+               ROW_NUMBER() OVER (
+                   PARTITION BY recipe.author_id ORDER BY recipe.id DESC
+               ) AS position
+        FROM {recipes} recipe
+        WHERE recipe.author_id IN ({author_ids})
+          AND recipe.author_id NOT IN (
+              SELECT counters.user_id
+              FROM {counters} counters
+              WHERE counters.feed_paused = %s
+          )
+    ) ranked
+    WHERE ranked.position <= %s
+    ON CONFLICT (user_id, recipe_id) DO NOTHING
+'''
+
+RESUME_FAN_OUT_SQL = '''
+    INSERT INTO {feed} (user_id, recipe_id)
+    SELECT subscription.user_id, latest.id
+    FROM (
+        SELECT recipe.id
+        FROM {recipes} recipe
+        WHERE recipe.author_id = %s
+        ORDER BY recipe.id DESC
+        LIMIT %s
+    ) latest
+    CROSS JOIN {subscriptions} subscription
+    WHERE subscription.author_id = %s
+    ON CONFLICT (user_id, recipe_id) DO NOTHING
+'''
+
+TRIM_SQL = '''
+    DELETE FROM {feed}
+    WHERE id IN (
+        SELECT ranked.id
+        FROM (
+            SELECT entry.id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY entry.user_id ORDER BY entry.recipe_id DESC
+                   ) AS position
+            FROM {feed} entry
+        ) ranked
+        WHERE ranked.position > %s
+    )
+'''
+
+
+def get_loaded_feed_paused(subscription):
+    """
+    Признак feed_paused автора из счётчиков, загруженных вместе с ним
+    через select_related('counters'), или None, если их нет в памяти.
+    """
+    if not Subscription.author.is_cached(subscription):
+        return None
+    author = subscription.author
+    if not User.counters.is_cached(author):
+        return None
+    counters = getattr(author, 'counters', None)
+    return counters.feed_paused if counters else False
+
+
+def is_fanned_out(author_id, feed_paused=None):
+    if feed_paused is None:
+        feed_paused = UserCounters.objects.filter(
+            user=author_id
+        ).values_list('feed_paused', flat=True).first()
+    return not feed_paused
+
+
+def fan_out_recipe(recipe):
+    """
+    Добавляет новый рецепт в ленты подписчиков автора.
+
+    Рецепты авторов с признаком feed_paused, который ставится,
+    когда подписчиков становится больше FEED_FANOUT_MAX_FOLLOWERS,
+    не раскладываются по лентам, а подмешиваются при чтении.
+    """
+    if not is_fanned_out(recipe.author_id):
+        return
+    sql = FAN_OUT_SQL.format(
+        feed=FeedEntry._meta.db_table,
+        subscriptions=Subscription._meta.db_table
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [recipe.pk, recipe.author_id])
+
+
+def fan_out_recipes(recipe_ids):
+    """То же, что fan_out_recipe, для нескольких рецептов одним запросом."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    sql = FAN_OUT_MANY_SQL.format(
+        feed=FeedEntry._meta.db_table,
+        recipes=Recipe._meta.db_table,
+        subscriptions=Subscription._meta.db_table,
+        counters=UserCounters._meta.db_table,
+        recipe_ids=', '.join(['%s'] * len(recipe_ids))
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*recipe_ids, True])
+
+
+def backfill_feed(user_id, author_id, feed_paused=None):
+    if not is_fanned_out(author_id, feed_paused):
+        return
+    sql = BACKFILL_SQL.format(
+        feed=FeedEntry._meta.db_table,
+        recipes=Recipe._meta.db_table
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, author_id, settings.FEED_BACKFILL_SIZE])
+
+
+def remove_from_feed(user_id, author_id):
+    FeedEntry.objects.filter(
+        user=user_id,
+        recipe__author=author_id
+    ).delete()
+
+
+def backfill_feed_many(user_id, author_ids):
+    """То же, что backfill_feed, для нескольких авторов одним запросом."""
+    author_ids = list(author_ids)
+    if not author_ids:
+        return
+    sql = BACKFILL_MANY_SQL.format(
+        feed=FeedEntry._meta.db_table,
+        recipes=Recipe._meta.db_table,
+        counters=UserCounters._meta.db_table,
+        author_ids=', '.join(['%s'] * len(author_ids))
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [
+            user_id,
+            *author_ids,
+            True,
+            settings.FEED_BACKFILL_SIZE
+        ])
+
+
+def resume_fan_out():
+    """
+    Возвращает к раскладке по лентам авторов, у которых подписчиков
+    стало не больше FEED_FANOUT_RESUME_FOLLOWERS, раскладывает их
+    последние FEED_BACKFILL_SIZE рецептов по лентам подписчиков
+    и возвращает число таких авторов.
+
+    Дозаполнение затрагивает всех подписчиков автора, поэтому
+    выполняется командой resume_feed_fan_out, а не в запросе отписки.
+    Порог ниже FEED_FANOUT_MAX_FOLLOWERS, чтобы подписки и отписки
+    у самой границы не запускали дозаполнение раз за разом.
+    Признак снимается до дозаполнения: рецепт, созданный в это время,
+    раскладывается сам, а лента лишь ненадолго остаётся неполной.
+    """
+    candidates = list(UserCounters.objects.filter(
+        feed_paused=True,
+        followers_count__lte=settings.FEED_FANOUT_RESUME_FOLLOWERS
+    ).values_list('user', flat=True))
+    sql = RESUME_FAN_OUT_SQL.format(
+        feed=FeedEntry._meta.db_table,
+        recipes=Recipe._meta.db_table,
+        subscriptions=Subscription._meta.db_table
+    )
+    resumed = 0
+    for author_id in candidates:
+        claimed = UserCounters.objects.filter(
+            user=author_id,
+            feed_paused=True,
+            followers_count__lte=settings.FEED_FANOUT_RESUME_FOLLOWERS
+        ).update(feed_paused=False)
+        if not claimed:
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql,
+                [author_id, settings.FEED_BACKFILL_SIZE, author_id]
+            )
+        resumed += 1
+    return resumed
+
+
+def trim_feeds(max_size):
+    """
+    Оставляет в ленте каждого пользователя max_size последних записей
+    и возвращает число удалённых.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            TRIM_SQL.format(feed=FeedEntry._meta.db_table),
+            [max_size]
+        )
+        return cursor.rowcount
+
+
+def remove_many_from_feed(user_id, author_ids):
+    FeedEntry.objects.filter(
+        user=user_id,
+        recipe__author__in=author_ids
+    ).delete()
+
+
+def get_feed_cursor(request):
+    before = request.query_params.get('before')
+    if before is None or before == '':
+        return None
+    try:
+        before = int(before)
+    except ValueError:
+        before = 0
+    if before < 1:
+        raise ValidationError(
+            {'before': 'Ожидается положительное целое число.'}
+        )
+    return before
+
+
+def get_feed(user, limit, before=None):
+    """
+    Возвращает id рецептов ленты пользователя по убыванию, не больше
+    limit, с id меньше before.
+
+    Лента читается по индексу (user_id, recipe_id), а рецепты авторов
+    без раскладки по лентам добавляются отдельным запросом по индексу
+    (author_id, id).
+    """
+    entries = FeedEntry.objects.filter(user=user)
+    pulled = Recipe.objects.filter(
+        author__in=Subscription.objects.filter(
+            user=user,
+            author__counters__feed_paused=True
+        ).values('author')
+    )
+    if before is not None:
+        entries = entries.filter(recipe__lt=before)
+        pulled = pulled.filter(id__lt=before)
+    ids = set(entries.order_by('-recipe').values_list(
+        'recipe',
+        flat=True
+    )[:limit])
+    ids.update(pulled.order_by('-id').values_list('id', flat=True)[:limit])
+    return sorted(ids, reverse=True)[:limit]
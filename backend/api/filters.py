@@ -1,18 +1,77 @@
+from django import forms
 from django.contrib.auth import get_user_model
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
 
 from foodgram.models import Recipe
 
+from .cache import tag_slugs
+from .pagination import MAX_PAGE_SIZE
+from .search import ingredient_index, search_recipes
+
 User = get_user_model()
 
 
-class NameSearchFilter(SearchFilter):
+class NameSearchFilter(BaseFilterBackend):
     search_param = 'name'
+    limit_param = 'limit'
+    default_limit = 50
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        return max(1, min(limit, MAX_PAGE_SIZE))
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query or view.action != 'list':
+            return queryset
+        return ingredient_index.search(query, self.get_limit(request))
+
+
+class StableOrderingFilter(OrderingFilter):
+    """Добавляет -id к сортировке, чтобы страницы не перекрывались."""
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and not {'id', '-id'} & set(ordering):
+            ordering = [*ordering, '-id']
+        return ordering
+
+
+class MultipleValueField(forms.Field):
+    widget = forms.SelectMultiple
+
+    def to_python(self, value):
+        if not value:
+            return []
+        return [str(item) for item in value]
+
+
+class TagSlugFilter(filters.Filter):
+    """
+    Фильтр рецептов по slug тегов без соединения с таблицей тегов.
+
+    Slug переводятся в id по кэшу, а рецепты отбираются подзапросом
+    к промежуточной таблице, поэтому DISTINCT не нужен.
+    """
+    field_class = MultipleValueField
+
+    def filter(self, queryset, value):
+        if not value:
+            return queryset
+        return queryset.filter(
+            id__in=Recipe.tags.through.objects.filter(
+                tag__in=tag_slugs.get_ids(value)
+            ).values('recipe')
+        )
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    search = filters.CharFilter(method='filter_search')
+    tags = TagSlugFilter()
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
@@ -23,6 +82,12 @@ class RecipeFilter(FilterSet):
         model = Recipe
         fields = ('author', 'tags')
 
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return search_recipes(queryset, value)
+
     def filter_is_favorited(self, queryset, name, value):
         if not self.request.user.is_anonymous and value:
             return queryset.filter(favorite__user=self.request.user)
@@ -0,0 +1,146 @@
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.counters import create_user_counters
+from foodgram.models import Ingredient, Recipe, RecipeIngredient
+
+User = get_user_model()
+
+
+class RollbackError(Exception):
+    pass
+
+
+def measure(func, repeat):
+    reset_queries()
+    with CaptureQueriesContext(connection) as context:
+        func()
+    queries = len(context.captured_queries)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'queries': queries,
+        'ms': round(statistics.median(timings) * 1000, 2),
+        'peak_kib': peak // 1024,
+    }
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@benchmark.local',
+        password='benchmark'
+    )
+
+
+def create_users(count, prefix='benchmark'):
+    users = User.objects.bulk_create([
+        User(
+            username=f'{prefix}{index}',
+            email=f'{prefix}{index}@benchmark.local',
+            password='!'
+        ) for index in range(count)
+    ])
+    if users and users[0].pk is None:
+        users = list(User.objects.filter(username__startswith=prefix))
+    create_user_counters([user.pk for user in users])
+    return users
+
+
+def create_ingredients(count, prefix='benchmark'):
+    ingredients = Ingredient.objects.bulk_create([
+        Ingredient(name=f'{prefix} {index}', measurement_unit='г')
+        for index in range(count)
+    ])
+    if ingredients and ingredients[0].pk is None:
+        ingredients = list(
+            Ingredient.objects.filter(name__startswith=f'{prefix} ')
+        )
+    return ingredients
+
+
+def create_recipes(author, count, ingredients, per_recipe=10):
+    recipes = Recipe.objects.bulk_create([
+        Recipe(
+            author=author,
+            name=f'benchmark {index}',
+            text='benchmark',
+            image='benchmark.png',
+            cooking_time=1
+        ) for index in range(count)
+    ])
+    if recipes and recipes[0].pk is None:
+        recipes = list(
+            Recipe.objects.filter(author=author).order_by('-id')[:count]
+        )
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient=ingredients[(index + shift) % len(ingredients)],
+            amount=index % 7 + 1
+        )
+        for index, recipe in enumerate(recipes)
+        for shift in range(min(per_recipe, len(ingredients)))
+    ])
+    return recipes
+
+
+def get_client(user=None):
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+    return client
+
+
+class BenchmarkCommand(BaseCommand):
+    """
+    Базовая команда замеров: данные создаются в транзакции,
+    которая откатывается по завершении.
+    """
+    default_sizes = (1, 10, 100)
+    columns = ('queries', 'ms', 'peak_kib')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=self.default_sizes
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def run_case(self, size, repeat):
+        raise NotImplementedError
+
+    def handle(self, *args, **options):
+        rows = []
+        try:
+            with transaction.atomic():
+                for size in options['sizes']:
+                    for name, metrics in self.run_case(
+                        size,
+                        options['repeat']
+                    ):
+                        rows.append((name, size, metrics))
+                raise RollbackError
+        except RollbackError:
+            pass
+        header = ('case', 'size') + self.columns
+        self.stdout.write('\t'.join(header))
+        for name, size, metrics in rows:
+            values = [str(metrics.get(column, '')) for column in self.columns]
+            self.stdout.write('\t'.join([name, str(size), *values]))
@@ -0,0 +1,76 @@
+from django.db import connection
+
+from api.feed import get_feed
+from foodgram.models import FeedEntry, Recipe, Subscription
+
+from ._benchmark import BenchmarkCommand, create_user, create_users, measure
+
+RECIPES_PER_AUTHOR = 3
+PAGE_SIZE = 6
+
+FILL_FEED_SQL = '''
+    INSERT INTO {feed} (user_id, recipe_id)
+    SELECT subscription.user_id, recipe.id
+    FROM {subscriptions} subscription
+    INNER JOIN {recipes} recipe ON recipe.author_id = subscription.author_id
+    WHERE subscription.user_id = %s
+'''
+
+
+def read_naive(user, before):
+    recipes = Recipe.objects.filter(
+        author__in=Subscription.objects.filter(user=user).values('author')
+    )
+    if before is not None:
+        recipes = recipes.filter(id__lt=before)
+    return list(recipes.order_by('-id').values_list('id', flat=True)[
+        :PAGE_SIZE
+    ])
+
+
+def read_pages(read, user, pages=3):
+    before = None
+    for _ in range(pages):
+        ids = read(user, before)
+        before = ids[-1]
+
+
+class Command(BenchmarkCommand):
+    help = ('Сравнение чтения ленты подписок из таблицы ленты '
+            'с запросом по всем авторам подписок.')
+    default_sizes = (1000, 10000)
+
+    def run_case(self, size, repeat):
+        reader = create_user(f'benchmark feed reader {size}')
+        authors = create_users(size, prefix=f'benchmark feed {size} ')
+        Recipe.objects.bulk_create([
+            Recipe(
+                author=author,
+                name=f'benchmark {index}',
+                text='benchmark',
+                image='benchmark.png',
+                cooking_time=1
+            )
+            for index in range(RECIPES_PER_AUTHOR)
+            for author in authors
+        ])
+        Subscription.objects.bulk_create([
+            Subscription(user=reader, author=author) for author in authors
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute(FILL_FEED_SQL.format(
+                feed=FeedEntry._meta.db_table,
+                subscriptions=Subscription._meta.db_table,
+                recipes=Recipe._meta.db_table
+            ), [reader.pk])
+        yield 'naive', measure(
+            lambda: read_pages(read_naive, reader),
+            repeat
+        )
+        yield 'feed', measure(
+            lambda: read_pages(
+                lambda user, before: get_feed(user, PAGE_SIZE, before),
+                reader
+            ),
+            repeat
+        )
@@ -0,0 +1,42 @@
+from api.filters import NameSearchFilter
+from api.search import ingredient_index
+from api.serializers import IngredientSerializer
+from foodgram.models import Ingredient
+
+from ._benchmark import BenchmarkCommand, create_ingredients, measure
+
+QUERIES = ('м', 'мо', 'мол', 'молок', 'сыр', 'ок')
+
+
+def search_ilike(limit):
+    for query in QUERIES:
+        IngredientSerializer(
+            Ingredient.objects.filter(name__icontains=query)[:limit],
+            many=True
+        ).data
+
+
+def search_index(limit):
+    for query in QUERIES:
+        IngredientSerializer(
+            ingredient_index.search(query, limit),
+            many=True
+        ).data
+
+
+class Command(BenchmarkCommand):
+    help = ('Сравнение поиска ингредиентов по индексу в памяти '
+            'с запросом ILIKE.')
+    default_sizes = (2000, 10000)
+
+    def run_case(self, size, repeat):
+        existing = Ingredient.objects.count()
+        if existing < size:
+            create_ingredients(
+                size - existing,
+                prefix=f'молоко benchmark {size}'
+            )
+        limit = NameSearchFilter.default_limit
+        yield 'ilike', measure(lambda: search_ilike(limit), repeat)
+        ingredient_index.version = None
+        yield 'index', measure(lambda: search_index(limit), repeat)
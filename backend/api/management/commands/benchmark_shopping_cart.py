@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+
+from django.test import override_settings
+
+from api.shopping_list import update_cart_totals_many
+from foodgram.models import ShoppingList
+
+from ._benchmark import (BenchmarkCommand, create_ingredients, create_recipes,
+                         create_user, get_client, measure)
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+def download(client):
+    response = client.get(URL)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def clear_directory(directory):
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+
+
+class Command(BenchmarkCommand):
+    help = ('Замер скачивания списка покупок в зависимости от размера '
+            'корзины: формирование PDF и отдача готового файла из кэша.')
+    default_sizes = (1, 10, 30, 100)
+
+    def run_case(self, size, repeat):
+        user = create_user(f'benchmark-cart-{size}')
+        ingredients = create_ingredients(200, prefix=f'cart {size}')
+        recipes = create_recipes(user, size, ingredients)
+        ShoppingList.objects.bulk_create([
+            ShoppingList(user=user, recipe=recipe) for recipe in recipes
+        ])
+        update_cart_totals_many([recipe.pk for recipe in recipes], 1, user.pk)
+        client = get_client(user)
+        directory = tempfile.mkdtemp()
+        try:
+            with override_settings(SHOPPING_LIST_CACHE_DIR=directory):
+                yield 'render', measure(
+                    lambda: (clear_directory(directory), download(client)),
+                    repeat
+                )
+                download(client)
+                yield 'cached', measure(lambda: download(client), repeat)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
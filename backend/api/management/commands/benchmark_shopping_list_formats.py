@@ -0,0 +1,59 @@
+import io
+import tempfile
+
+from django.test import override_settings
+
+from api.pdf import render_shopping_list
+from api.shopping_list import get_shopping_list
+from foodgram.models import ShoppingCartIngredient
+
+from ._benchmark import (BenchmarkCommand, create_ingredients, create_user,
+                         get_client, measure)
+
+
+def download(client, export_format):
+    response = client.get(
+        '/api/recipes/download_shopping_cart/',
+        {'format': export_format}
+    )
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+class Command(BenchmarkCommand):
+    help = 'Сравнение форматов выгрузки списка покупок с PDF.'
+    default_sizes = (10, 100, 1000)
+
+    def run_case(self, size, repeat):
+        user = create_user(f'benchmark-formats-{size}')
+        ingredients = create_ingredients(size, prefix=f'formats {size}')
+        ShoppingCartIngredient.objects.bulk_create([
+            ShoppingCartIngredient(
+                user=user,
+                ingredient=ingredient,
+                amount=index + 1,
+                recipes_count=1
+            ) for index, ingredient in enumerate(ingredients)
+        ])
+        client = get_client(user)
+        for export_format in ('txt', 'csv', 'json'):
+            yield export_format, measure(
+                lambda: download(client, export_format),
+                repeat
+            )
+        yield 'pdf', measure(
+            lambda: render_shopping_list(
+                io.BytesIO(),
+                'Список покупок:',
+                get_shopping_list(user).iterator()
+            ),
+            repeat
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(SHOPPING_LIST_CACHE_DIR=directory):
+                yield 'pdf_cached', measure(
+                    lambda: download(client, 'pdf'),
+                    repeat
+                )
@@ -0,0 +1,48 @@
+import io
+
+from django.http import HttpResponse
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from api.pdf import FONT_PATH, render_shopping_list
+from api.shopping_list import format_line
+
+from ._benchmark import BenchmarkCommand, measure
+
+
+def render_legacy(ingredients):
+    buf = io.BytesIO()
+    p = canvas.Canvas(buf, pagesize=A4)
+    pdfmetrics.registerFont(TTFont('legacy', FONT_PATH))
+    p.setFont('legacy', 20)
+    p.drawString(50, 780, 'Список покупок:')
+    p.setFont('legacy', 14)
+    for ind, ingredient in enumerate(ingredients):
+        p.drawString(65, 750 - 20 * ind, format_line(ingredient))
+    p.showPage()
+    p.save()
+    buf.seek(0)
+    return buf.read()
+
+
+def render(ingredients):
+    response = HttpResponse(content_type='application/pdf')
+    render_shopping_list(response, 'Список покупок:', ingredients)
+    return response
+
+
+class Command(BenchmarkCommand):
+    help = 'Замер формирования PDF списка покупок разной длины.'
+    default_sizes = (10, 100, 1000)
+    columns = ('ms', 'peak_kib')
+
+    def run_case(self, size, repeat):
+        ingredients = [
+            {'name': f'ингредиент {index}', 'measurement_unit': 'г',
+             'amount': index}
+            for index in range(size)
+        ]
+        yield 'legacy', measure(lambda: render_legacy(ingredients), repeat)
+        yield 'pdf', measure(lambda: render(ingredients), repeat)
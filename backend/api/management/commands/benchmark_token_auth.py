@@ -0,0 +1,41 @@
+from django.test import RequestFactory
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.authentication import CachedTokenAuthentication
+from api.cache import token_cache
+
+from ._benchmark import BenchmarkCommand, create_users, measure
+
+
+def authenticate_all(authentication, requests):
+    for request in requests:
+        authentication.authenticate(request)
+
+
+class Command(BenchmarkCommand):
+    help = ('Сравнение проверки токенов через базу и через кэш токенов '
+            'на запросах разных пользователей.')
+    default_sizes = (100, 1000)
+
+    def run_case(self, size, repeat):
+        users = create_users(size, prefix=f'benchmark token {size} ')
+        tokens = Token.objects.bulk_create([
+            Token(key=Token.generate_key(), user=user) for user in users
+        ])
+        factory = RequestFactory()
+        requests = [
+            factory.get('/', HTTP_AUTHORIZATION=f'Token {token.key}')
+            for token in tokens
+        ]
+        yield 'database', measure(
+            lambda: authenticate_all(TokenAuthentication(), requests),
+            repeat
+        )
+        token_cache.clear()
+        authenticate_all(CachedTokenAuthentication(), requests)
+        yield 'cached', measure(
+            lambda: authenticate_all(CachedTokenAuthentication(), requests),
+            repeat
+        )
+        token_cache.clear()
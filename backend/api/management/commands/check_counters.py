@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.counters import (bump_favorites_versions, compute_favorites_counts,
+                          compute_user_counters)
+from foodgram.models import Recipe, UserCounters
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики рецептов, подписчиков и избранного '
+            'по исходным таблицам и сообщает о расхождениях.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Перезаписать расходящиеся счётчики пересчитанными '
+                 'значениями.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user_drift = self.check_users()
+            recipe_drift = self.check_recipes()
+            if options['fix']:
+                self.fix(user_drift, recipe_drift)
+        message = (f'Расхождений: пользователи {len(user_drift)}, '
+                   f'рецепты {len(recipe_drift)}')
+        if (user_drift or recipe_drift) and options['fix']:
+            message += ', исправлено'
+        self.stdout.write(message)
+
+    def check_users(self):
+        expected = compute_user_counters()
+        stored = {
+            user_id: (recipes_count, followers_count)
+            for user_id, recipes_count, followers_count
+            in UserCounters.objects.values_list(
+                'user', 'recipes_count', 'followers_count'
+            )
+        }
+        drift = {}
+        for user_id in User.objects.values_list('id', flat=True):
+            counters = expected.get(user_id, (0, 0))
+            if stored.get(user_id) != counters:
+                self.stdout.write(
+                    f'user={user_id}: stored={stored.get(user_id)} '
+                    f'expected={counters}'
+                )
+                drift[user_id] = counters
+        return drift
+
+    def check_recipes(self):
+        expected = compute_favorites_counts()
+        drift = {}
+        for recipe_id, favorites_count in Recipe.objects.values_list(
+            'id', 'favorites_count'
+        ):
+            count = expected.get(recipe_id, 0)
+            if favorites_count != count:
+                self.stdout.write(
+                    f'recipe={recipe_id}: stored={favorites_count} '
+                    f'expected={count}'
+                )
+                drift[recipe_id] = count
+        return drift
+
+    def fix(self, user_drift, recipe_drift):
+        paused = set(UserCounters.objects.filter(
+            user__in=user_drift,
+            feed_paused=True
+        ).values_list('user', flat=True))
+        UserCounters.objects.filter(user__in=user_drift).delete()
+        UserCounters.objects.bulk_create([
+            UserCounters(
+                user_id=user_id,
+                recipes_count=recipes_count,
+                followers_count=followers_count,
+                feed_paused=(
+                    user_id in paused
+                    or followers_count > settings.FEED_FANOUT_MAX_FOLLOWERS
+                )
+            )
+            for user_id, (recipes_count, followers_count)
+            in user_drift.items()
+        ])
+        for recipe_id, count in recipe_drift.items():
+            Recipe.objects.filter(pk=recipe_id).update(favorites_count=count)
+        bump_favorites_versions(recipe_drift)
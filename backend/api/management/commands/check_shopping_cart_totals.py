@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.shopping_list import compute_shopping_list_totals
+from foodgram.models import ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает сводные списки покупок по корзинам '
+            'и сообщает о расхождениях.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Перезаписать расходящиеся строки пересчитанными значениями.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = {
+                (row['user'], row['ingredient']): (
+                    row['amount'] or 0,
+                    row['recipes_count']
+                ) for row in compute_shopping_list_totals()
+            }
+            stored = {
+                (row['user'], row['ingredient']): (
+                    row['amount'],
+                    row['recipes_count']
+                ) for row in ShoppingCartIngredient.objects.values(
+                    'user', 'ingredient', 'amount', 'recipes_count'
+                )
+            }
+            drift = sorted(
+                key for key in expected.keys() | stored.keys()
+                if expected.get(key) != stored.get(key)
+            )
+            for user, ingredient in drift:
+                self.stdout.write(
+                    f'user={user} ingredient={ingredient}: '
+                    f'stored={stored.get((user, ingredient))} '
+                    f'expected={expected.get((user, ingredient))}'
+                )
+            if drift and options['fix']:
+                self.fix(drift, expected)
+        message = f'Расхождений: {len(drift)}'
+        if drift and options['fix']:
+            message += ', исправлено'
+        self.stdout.write(message)
+
+    def fix(self, drift, expected):
+        for user, ingredient in drift:
+            ShoppingCartIngredient.objects.filter(
+                user=user,
+                ingredient=ingredient
+            ).delete()
+        ShoppingCartIngredient.objects.bulk_create([
+            ShoppingCartIngredient(
+                user_id=user,
+                ingredient_id=ingredient,
+                amount=expected[(user, ingredient)][0],
+                recipes_count=expected[(user, ingredient)][1]
+            )
+            for user, ingredient in drift
+            if (user, ingredient) in expected
+        ])
@@ -0,0 +1,149 @@
+import re
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+
+from api.filters import RecipeFilter
+from api.views import RecipeViewSet, SubscriptionViewSet
+from foodgram.models import Favorite, Recipe, ShoppingList, Subscription, Tag
+
+from ._benchmark import (RollbackError, create_ingredients, create_recipes,
+                         create_users)
+
+SEQUENTIAL_SCANS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)\s*$', re.MULTILINE),
+}
+# Первая страница общего списка читается в порядке первичного ключа
+# и останавливается на LIMIT; в SQLite такой обход выглядит как SCAN.
+ORDERED_SCANS = {
+    'sqlite': {'recipes': {'foodgram_recipe'}},
+}
+PAGE_SIZE = 6
+
+
+def filter_recipes(user, **params):
+    data = QueryDict(mutable=True)
+    for name, value in params.items():
+        data.setlist(name, value if isinstance(value, list) else [value])
+    return RecipeFilter(
+        data,
+        queryset=RecipeViewSet.queryset,
+        request=SimpleNamespace(user=user)
+    ).qs
+
+
+def get_subscriptions(user):
+    view = SubscriptionViewSet()
+    view.request = SimpleNamespace(user=user)
+    return view.get_queryset()
+
+
+class Command(BaseCommand):
+    help = ('Выполняет частые запросы под EXPLAIN на сгенерированных данных '
+            'и отмечает последовательные сканирования таблиц.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--recipes-per-user', type=int, default=40)
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Завершиться ошибкой, если найдены последовательные '
+                 'сканирования.'
+        )
+
+    def seed(self, users_count, recipes_per_user):
+        users = create_users(users_count, prefix='explain')
+        ingredients = create_ingredients(10, prefix='explain')
+        tags = [
+            Tag.objects.create(
+                name=f'explain{index}',
+                color=f'#EEEEE{index}',
+                slug=f'explain{index}'
+            ) for index in range(3)
+        ]
+        recipes = []
+        for user in users:
+            recipes.extend(create_recipes(
+                user,
+                recipes_per_user,
+                ingredients,
+                per_recipe=1
+            ))
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe=recipe, tag=tags[index % len(tags)])
+            for index, recipe in enumerate(recipes)
+        ])
+        for model, step in ((Favorite, 7), (ShoppingList, 31)):
+            model.objects.bulk_create([
+                model(user=user, recipe=recipes[index])
+                for offset, user in enumerate(users)
+                for index in range(offset, len(recipes), step * len(users))
+            ])
+        Subscription.objects.bulk_create([
+            Subscription(
+                user=user,
+                author=users[(offset + shift) % len(users)]
+            )
+            for offset, user in enumerate(users)
+            for shift in range(1, 11)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return users[0], users[1], [tag.slug for tag in tags[:2]]
+
+    def get_queries(self, user, author, slugs):
+        return (
+            ('recipes', RecipeViewSet.queryset),
+            ('recipes_by_author', filter_recipes(user, author=author.id)),
+            ('recipes_by_tags', filter_recipes(user, tags=slugs)),
+            ('favorited_recipes', filter_recipes(user, is_favorited='1')),
+            ('recipes_in_cart',
+             filter_recipes(user, is_in_shopping_cart='1')),
+            ('favorite_ids', Favorite.objects.filter(
+                user=user
+            ).values_list('recipe_id', flat=True)),
+            ('shopping_cart_ids', ShoppingList.objects.filter(
+                user=user
+            ).values_list('recipe_id', flat=True)),
+            ('subscription_ids', Subscription.objects.filter(
+                user=user
+            ).values_list('author_id', flat=True)),
+            ('subscriptions', get_subscriptions(user)),
+            ('author_recipes', Recipe.objects.filter(author=author)),
+        )
+
+    def handle(self, *args, **options):
+        pattern = SEQUENTIAL_SCANS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f'Не поддерживается: {connection.vendor}')
+        plans = []
+        try:
+            with transaction.atomic():
+                queries = self.get_queries(*self.seed(
+                    options['users'],
+                    options['recipes_per_user']
+                ))
+                for name, queryset in queries:
+                    plans.append((name, queryset[:PAGE_SIZE].explain()))
+                raise RollbackError
+        except RollbackError:
+            pass
+        ordered_scans = ORDERED_SCANS.get(connection.vendor, {})
+        flagged = 0
+        for name, plan in plans:
+            tables = sorted(
+                set(pattern.findall(plan)) - ordered_scans.get(name, set())
+            )
+            if tables:
+                flagged += 1
+                self.stdout.write(f'{name}\tSEQ SCAN: {", ".join(tables)}')
+            else:
+                self.stdout.write(f'{name}\tok')
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+        if flagged and options['strict']:
+            raise CommandError(f'Запросов с сканированием таблиц: {flagged}')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.feed import resume_fan_out
+
+
+class Command(BaseCommand):
+    help = ('Возвращает к раскладке по лентам авторов, у которых '
+            'подписчиков стало не больше FEED_FANOUT_RESUME_FOLLOWERS, '
+            'и дозаполняет ленты их подписчиков.')
+
+    def handle(self, *args, **options):
+        resumed = resume_fan_out()
+        self.stdout.write(f'Авторов возвращено к раскладке: {resumed}')
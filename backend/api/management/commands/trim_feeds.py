@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.feed import trim_feeds
+
+
+class Command(BaseCommand):
+    help = ('Удаляет из лент подписок записи старше FEED_MAX_SIZE '
+            'последних у каждого пользователя.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-size',
+            type=int,
+            default=settings.FEED_MAX_SIZE,
+            help='Сколько последних записей оставить в каждой ленте.'
+        )
+
+    def handle(self, *args, **options):
+        deleted = trim_feeds(options['max_size'])
+        self.stdout.write(f'Удалено записей ленты: {deleted}')
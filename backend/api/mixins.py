@@ -0,0 +1,130 @@
+import hashlib
+import re
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+
+from .cache import data_versions, rendered_responses, user_membership
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class ConditionalGetMixin:
+    """
+    ETag для list и retrieve по версиям данных.
+
+    При совпадении If-None-Match ответ 304 возвращается до обращения
+    к базе и сериализаторам. Last-Modified не отправляется: с точностью
+    до секунды он пропускал изменения, сделанные в ту же секунду,
+    что и предыдущий ответ.
+    """
+    version_names = ()
+    user_dependent = False
+
+    def get_version_names(self, request):
+        names = list(self.version_names)
+        if self.user_dependent and request.user.is_authenticated:
+            names.append(user_membership.make_key(request.user.pk))
+        return names
+
+    def get_etag(self, request):
+        versions = data_versions.get_many(self.get_version_names(request))
+        key = ':'.join([
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+            request.META.get('HTTP_ACCEPT_ENCODING', ''),
+            str(request.user.pk),
+            *(str(versions[name]) for name in sorted(versions))
+        ])
+        return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if self.user_dependent:
+                patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve,
+            request,
+            *args,
+            **kwargs
+        )
+
+
+class RenderedListCacheMixin:
+    """
+    Кэш отрендеренного списка справочных данных.
+
+    Список без параметров запроса отдаётся готовыми байтами из кэша,
+    в том числе заранее сжатыми gzip. Ключ зависит от версий данных
+    version_names, которые сбрасываются сигналами и командами импорта.
+    """
+    version_names = ()
+    cached_formats = ('json',)
+
+    def is_cacheable(self, request):
+        renderer = request.accepted_renderer
+        return (
+            not request.query_params
+            and renderer.format in self.cached_formats
+            and request.accepted_media_type == renderer.media_type
+        )
+
+    def render_list(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        response = super().list(request, *args, **kwargs)
+        content = renderer.render(
+            response.data,
+            request.accepted_media_type,
+            self.get_renderer_context()
+        )
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+        return content_type, content
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return super().list(request, *args, **kwargs)
+        key = rendered_responses.make_key(
+            request.path,
+            request.accepted_renderer.format,
+            data_versions.get_many(self.version_names)
+        )
+        entry = rendered_responses.get(key)
+        if entry is None:
+            entry = rendered_responses.set(
+                key,
+                *self.render_list(request, *args, **kwargs)
+            )
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if entry['gzip'] is not None and ACCEPTS_GZIP.search(accept_encoding):
+            response = HttpResponse(
+                entry['gzip'],
+                content_type=entry['content_type']
+            )
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(
+                entry['identity'],
+                content_type=entry['content_type']
+            )
+        response['Content-Length'] = len(response.content)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
@@ -1,5 +1,84 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+MAX_PAGE_SIZE = 100
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class CustomCursorPagination(CursorPagination):
+    ordering = '-id'
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    count_query_param = 'count'
+
+    def check_ordering(self, queryset):
+        """
+        Курсор строится по полям модели, поэтому сортировка
+        по вычисляемому столбцу (релевантности поиска) им теряется.
+        """
+        extra_select = queryset.query.extra_select
+        if any(field.lstrip('-') in extra_select
+               for field in queryset.query.order_by):
+            raise ValidationError({
+                self.cursor_query_param: (
+                    'Курсорная пагинация недоступна при сортировке '
+                    'по релевантности поиска.'
+                )
+            })
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.check_ordering(queryset)
+        self.count = None
+        count = request.query_params.get(self.count_query_param, '')
+        if count.lower() in ('1', 'true'):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        for backend in getattr(view, 'filter_backends', ()):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    return tuple(ordering)
+        return (self.ordering,)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+
+class OptionalCursorPagination(CustomPagination):
+    """
+    Постраничная пагинация, переключаемая в режим курсора (keyset по -id)
+    параметром запроса cursor, в том числе пустым для первой страницы.
+    """
+    cursor_pagination_class = CustomCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        cursor_query_param = self.cursor_pagination_class.cursor_query_param
+        if cursor_query_param in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset,
+                request,
+                view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
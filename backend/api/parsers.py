@@ -0,0 +1,16 @@
+import codecs
+
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Отдаёт тело запроса как поток строк без разбора, чтобы большие
+    загрузки обрабатывались по мере чтения.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return iter(())
+        return codecs.getreader('utf-8')(stream)
@@ -0,0 +1,49 @@
+import os
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from .shopping_list import format_line
+
+RENDERER_VERSION = 1
+
+FONT_NAME = 'font'
+FONT_PATH = os.path.join(settings.BASE_DIR, 'fonts', 'arial.ttf')
+
+TITLE_FONT_SIZE = 20
+LINE_FONT_SIZE = 14
+LINE_HEIGHT = 20
+LEFT_MARGIN = 50
+LINE_INDENT = 65
+TOP = 780
+BOTTOM = 50
+
+
+def register_font():
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+
+def render_shopping_list(output, title, ingredients):
+    """
+    Записывает список покупок в output, переходя на новую страницу,
+    когда строки не помещаются на текущую.
+    """
+    register_font()
+    pdf = canvas.Canvas(output, pagesize=A4)
+    pdf.setFont(FONT_NAME, TITLE_FONT_SIZE)
+    pdf.drawString(LEFT_MARGIN, TOP, title)
+    pdf.setFont(FONT_NAME, LINE_FONT_SIZE)
+    y = TOP - 30
+    for ingredient in ingredients:
+        if y < BOTTOM:
+            pdf.showPage()
+            pdf.setFont(FONT_NAME, LINE_FONT_SIZE)
+            y = TOP
+        pdf.drawString(LINE_INDENT, y, format_line(ingredient))
+        y -= LINE_HEIGHT
+    pdf.showPage()
+    pdf.save()
@@ -7,4 +7,4 @@ class IsAuthorOrReadOnlyPermission(permissions.BasePermission):
             return True
         if not request.user.is_authenticated:
             return False
-        return obj.author == request.user
+        return obj.author_id == request.user.id
@@ -0,0 +1,334 @@
+import json
+import os
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Max
+from rest_framework.exceptions import ValidationError
+
+from foodgram.models import (Ingredient, Recipe, RecipeIngredient, Tag,
+                             UserCounters)
+
+from .cache import data_versions
+from .counters import create_user_counters
+from .feed import fan_out_recipes
+
+User = get_user_model()
+
+MAX_NAME_LENGTH = Recipe._meta.get_field('name').max_length
+
+
+class RecordError(ValueError):
+    pass
+
+
+class ImportStats:
+    def __init__(self, skipped_lines=0):
+        self.lines = skipped_lines
+        self.created = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        elapsed = self.elapsed
+        return self.created / elapsed if elapsed else 0
+
+    def as_dict(self, max_errors=None):
+        return {
+            'lines': self.lines,
+            'created': self.created,
+            'failed': len(self.errors),
+            'errors': [
+                {'line': line, 'error': message}
+                for line, message in self.errors[:max_errors]
+            ],
+            'recipes_per_second': round(self.rate),
+        }
+
+
+def get_import_skip(request):
+    skip = request.query_params.get('skip')
+    if skip is None or skip == '':
+        return 0
+    try:
+        skip = int(skip)
+    except ValueError:
+        skip = -1
+    if skip < 0:
+        raise ValidationError(
+            {'skip': 'Ожидается неотрицательное целое число.'}
+        )
+    return skip
+
+
+def is_positive_int(value):
+    return (isinstance(value, int) and not isinstance(value, bool)
+            and value >= 1)
+
+
+def require(condition, message):
+    if not condition:
+        raise RecordError(message)
+
+
+def delete_images(names):
+    for name in names:
+        default_storage.delete(name)
+
+
+def assign_recipe_ids(recipes, last_id):
+    """
+    Проставляет pk рецептам после bulk_create на бэкендах, которые их
+    не возвращают. Вызывается в той же транзакции: строки новее last_id
+    сопоставляются по автору и названию, одноимённые рецепты одного
+    автора получают id в порядке вставки, чужие строки пропускаются.
+    """
+    wanted = Counter((recipe.author_id, recipe.name) for recipe in recipes)
+    ids = {}
+    for pk, author_id, name in Recipe.objects.filter(
+        id__gt=last_id
+    ).order_by('-id').values_list('id', 'author_id', 'name'):
+        key = (author_id, name)
+        found = ids.setdefault(key, [])
+        if len(found) < wanted[key]:
+            found.append(pk)
+    for recipe in reversed(recipes):
+        found = ids.get((recipe.author_id, recipe.name))
+        if not found:
+            raise RuntimeError(
+                f'Не найден добавленный рецепт {recipe.name!r}.'
+            )
+        recipe.pk = found.pop(0)
+
+
+class RecipeImporter:
+    """
+    Загружает рецепты из NDJSON: по одному объекту JSON на строку.
+
+        {"author": "username", "name": "...", "text": "...",
+         "cooking_time": 10, "image": "recipes/1.jpg",
+         "tags": ["breakfast"],
+         "ingredients": [{"name": "соль", "measurement_unit": "г",
+                          "amount": 5}]}
+
+    Авторы, теги (по slug или названию) и ингредиенты сопоставляются
+    по словарям в памяти, загруженным один раз. Рецепты, ингредиенты
+    и теги пишутся bulk_create пачками по batch_size строк, каждая
+    пачка — в своей транзакции. Сигналы при этом не отправляются,
+    поэтому счётчики авторов и ленты подписчиков обновляются
+    для пачки целиком. Строки с ошибками пропускаются и попадают
+    в ImportStats.errors.
+
+    Картинка — путь к файлу относительно images_root. Файлы внутри
+    MEDIA_ROOT используются на месте, остальные копируются в хранилище
+    при сохранении пачки и удаляются, если её транзакция откатилась.
+    """
+
+    def __init__(self, images_root, default_author=None, batch_size=1000):
+        self.images_root = os.path.realpath(images_root)
+        self.media_root = os.path.realpath(settings.MEDIA_ROOT)
+        self.default_author = default_author
+        self.batch_size = batch_size
+        self.authors = dict(User.objects.values_list('username', 'id'))
+        self.tags = {}
+        for tag_id, name, slug in Tag.objects.values_list(
+            'id', 'name', 'slug'
+        ):
+            self.tags[name] = tag_id
+            self.tags[slug] = tag_id
+        self.ingredients = {}
+        units = Counter()
+        for ingredient_id, name, unit in Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit'
+        ):
+            self.ingredients[(name, unit)] = ingredient_id
+            self.ingredients[(name, None)] = ingredient_id
+            units[name] += 1
+        for name, count in units.items():
+            if count > 1:
+                del self.ingredients[(name, None)]
+
+    def get_author(self, record):
+        username = record.get('author')
+        if username is None:
+            require(self.default_author is not None, 'не указан автор')
+            return self.default_author.id
+        require(username in self.authors, f'нет автора {username!r}')
+        return self.authors[username]
+
+    def get_tags(self, record):
+        tags = record.get('tags', [])
+        require(isinstance(tags, list), 'tags должен быть списком')
+        tag_ids = []
+        for tag in tags:
+            require(tag in self.tags, f'нет тега {tag!r}')
+            tag_ids.append(self.tags[tag])
+        return list(dict.fromkeys(tag_ids))
+
+    def get_ingredients(self, record):
+        ingredients = record.get('ingredients', [])
+        require(
+            isinstance(ingredients, list),
+            'ingredients должен быть списком'
+        )
+        amounts = {}
+        for ingredient in ingredients:
+            require(isinstance(ingredient, dict), 'неверный ингредиент')
+            key = (ingredient.get('name'), ingredient.get('measurement_unit'))
+            require(key in self.ingredients, f'нет ингредиента {key[0]!r}')
+            ingredient_id = self.ingredients[key]
+            amount = ingredient.get('amount')
+            require(
+                is_positive_int(amount),
+                f'неверное количество для {key[0]!r}'
+            )
+            require(
+                ingredient_id not in amounts,
+                f'ингредиент {key[0]!r} указан дважды'
+            )
+            amounts[ingredient_id] = amount
+        return amounts
+
+    def get_image(self, record):
+        """
+        Возвращает имя картинки в MEDIA_ROOT или None и путь к файлу,
+        который нужно скопировать в хранилище при сохранении пачки.
+        """
+        image = record.get('image')
+        require(isinstance(image, str) and image, 'не указана картинка')
+        path = os.path.realpath(os.path.join(self.images_root, image))
+        require(
+            path.startswith(self.images_root + os.sep),
+            f'картинка {image!r} вне каталога импорта'
+        )
+        require(os.path.isfile(path), f'нет файла {image!r}')
+        if path.startswith(self.media_root + os.sep):
+            return os.path.relpath(path, self.media_root), None
+        return None, path
+
+    def copy_images(self, batch):
+        upload_to = Recipe._meta.get_field('image').upload_to
+        copied = []
+        try:
+            for recipe, _, _, source in batch:
+                if source is None:
+                    continue
+                with open(source, 'rb') as file:
+                    recipe.image = default_storage.save(
+                        os.path.join(upload_to, os.path.basename(source)),
+                        File(file)
+                    )
+                copied.append(recipe.image.name)
+        except BaseException:
+            delete_images(copied)
+            raise
+        return copied
+
+    def parse(self, line):
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise RecordError(f'неверный JSON: {error}')
+        require(isinstance(record, dict), 'ожидался объект JSON')
+        name = record.get('name')
+        require(
+            isinstance(name, str) and 0 < len(name) <= MAX_NAME_LENGTH,
+            'неверное название'
+        )
+        text = record.get('text')
+        require(isinstance(text, str) and text, 'не указано описание')
+        cooking_time = record.get('cooking_time')
+        require(
+            is_positive_int(cooking_time),
+            'неверное время приготовления'
+        )
+        recipe = Recipe(
+            author_id=self.get_author(record),
+            name=name,
+            text=text,
+            cooking_time=cooking_time
+        )
+        tags = self.get_tags(record)
+        ingredients = self.get_ingredients(record)
+        recipe.image, source = self.get_image(record)
+        return recipe, tags, ingredients, source
+
+    def save(self, batch):
+        copied = self.copy_images(batch)
+        try:
+            self.save_recipes(batch)
+        except BaseException:
+            delete_images(copied)
+            raise
+
+    def save_recipes(self, batch):
+        recipes = [recipe for recipe, _, _, _ in batch]
+        with transaction.atomic():
+            last_id = Recipe.objects.aggregate(last_id=Max('id'))['last_id']
+            created = Recipe.objects.bulk_create(recipes)
+            if created[0].pk is None:
+                assign_recipe_ids(created, last_id or 0)
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe_id=recipe.pk,
+                    ingredient_id=ingredient_id,
+                    amount=amount
+                )
+                for recipe, _, ingredients, _ in batch
+                for ingredient_id, amount in ingredients.items()
+            ])
+            Recipe.tags.through.objects.bulk_create([
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                for recipe, tags, _, _ in batch
+                for tag_id in tags
+            ])
+            authors = Counter(recipe.author_id for recipe in recipes)
+            create_user_counters(authors)
+            for author_id, count in authors.items():
+                UserCounters.objects.filter(user=author_id).update(
+                    recipes_count=F('recipes_count') + count
+                )
+            fan_out_recipes([recipe.pk for recipe in recipes])
+
+    def run(self, lines, skip=0, on_batch=None):
+        """
+        Импортирует строки, пропустив первые skip. После каждой
+        сохранённой пачки вызывает on_batch(stats): stats.lines — номер
+        последней строки, которая уже не нуждается в повторном импорте.
+        """
+        stats = ImportStats(skip)
+        batch = []
+        for number, line in enumerate(lines, 1):
+            if number <= skip:
+                continue
+            if not line.strip():
+                stats.lines = number
+                continue
+            try:
+                batch.append(self.parse(line))
+            except RecordError as error:
+                stats.errors.append((number, str(error)))
+            stats.lines = number
+            if len(batch) >= self.batch_size:
+                self.flush(batch, stats, on_batch)
+                batch = []
+        if batch:
+            self.flush(batch, stats, on_batch)
+        return stats
+
+    def flush(self, batch, stats, on_batch):
+        self.save(batch)
+        data_versions.bump('recipes')
+        stats.created += len(batch)
+        if on_batch is not None:
+            on_batch(stats)
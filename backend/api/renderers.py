@@ -0,0 +1,31 @@
+from rest_framework.renderers import BaseRenderer
+
+
+class PassthroughRenderer(BaseRenderer):
+    """
+    Рендерер для действий, которые сами формируют тело ответа
+    и возвращают HttpResponse; используется для выбора формата.
+    """
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return str(data).encode()
+
+
+class PDFRenderer(PassthroughRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+class PlainTextRenderer(PassthroughRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+
+class CSVRenderer(PassthroughRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
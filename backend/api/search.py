@@ -0,0 +1,160 @@
+import bisect
+import re
+import sqlite3
+import threading
+
+from django.db import connections
+from django.db.models import Q
+
+from foodgram.models import Ingredient
+
+from .cache import data_versions
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Строится при первом обращении и перестраивается, когда меняется
+    версия данных 'ingredients'. Совпадения с начала названия
+    возвращаются раньше совпадений внутри названия.
+    """
+    version_name = 'ingredients'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.index = ([], [])
+
+    def build(self):
+        ingredients = sorted(
+            (name.casefold(), pk, name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        keys = [ingredient[0] for ingredient in ingredients]
+        entries = [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, pk, name, measurement_unit in ingredients
+        ]
+        return keys, entries
+
+    def refresh(self):
+        version = data_versions.get_many([self.version_name])[
+            self.version_name
+        ]
+        if version == self.version:
+            return
+        with self.lock:
+            if version != self.version:
+                self.index = self.build()
+                self.version = version
+
+    def search(self, query, limit):
+        self.refresh()
+        keys, entries = self.index
+        query = query.casefold()
+        start = bisect.bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        results = entries[start:min(end, start + limit)]
+        if len(results) == limit:
+            return results
+        for index, key in enumerate(keys):
+            if query in key and not start <= index < end:
+                results.append(entries[index])
+                if len(results) == limit:
+                    break
+        return results
+
+
+ingredient_index = IngredientIndex()
+
+
+SEARCH_CONFIG = 'russian'
+SIMILARITY_THRESHOLD = 0.6
+NAME_WEIGHT = 10
+SQLITE_SEARCH_TABLE = 'foodgram_recipe_search'
+
+
+def get_trigrams(value):
+    return {
+        word[start:start + 3]
+        for word in re.findall(r'\w+', value.casefold())
+        for start in range(len(word) - 2)
+    }
+
+
+def trigram_coverage(query, document):
+    """Доля триграмм запроса, которые встречаются в документе."""
+    trigrams = get_trigrams(query)
+    if not trigrams:
+        return 0.0
+    return len(trigrams & get_trigrams(document)) / len(trigrams)
+
+
+def search_postgresql(queryset, query):
+    table = queryset.model._meta.db_table
+    vector = (f"to_tsvector('{SEARCH_CONFIG}', "
+              f"{table}.name || ' ' || {table}.text)")
+    tsquery = f"plainto_tsquery('{SEARCH_CONFIG}', %s)"
+    return queryset.extra(
+        select={
+            'search_rank': (f'ts_rank({vector}, {tsquery}) + '
+                            f'word_similarity(%s, {table}.name)')
+        },
+        select_params=(query, query),
+        where=[f'({vector} @@ {tsquery} OR %s <%% {table}.name)'],
+        params=(query, query)
+    )
+
+
+def search_sqlite(queryset, query, trigrams):
+    table = queryset.model._meta.db_table
+    match = ' OR '.join(
+        '"{}"'.format(trigram.replace('"', '""'))
+        for trigram in sorted(trigrams)
+    )
+    return queryset.extra(
+        select={
+            'search_rank': (f'trigram_coverage(%s, {table}.name) * '
+                            f'{NAME_WEIGHT} + '
+                            f'trigram_coverage(%s, {table}.text)')
+        },
+        select_params=(query, query),
+        where=[
+            f'{table}.id IN (SELECT rowid FROM {SQLITE_SEARCH_TABLE} '
+            f'WHERE {SQLITE_SEARCH_TABLE} MATCH %s)',
+            f"trigram_coverage(%s, {table}.name || ' ' || {table}.text) "
+            f'>= {SIMILARITY_THRESHOLD}'
+        ],
+        params=(match, query)
+    )
+
+
+def search_recipes(queryset, query):
+    """
+    Отбирает рецепты по названию и описанию и сортирует их
+    по релевантности.
+
+    На PostgreSQL используются GIN-индексы: полнотекстовый по названию
+    и описанию и триграммный по названию, который допускает опечатки.
+    На SQLite кандидаты отбираются по таблице FTS5 с триграммным
+    токенизатором и отсеиваются по доле совпавших триграмм запроса.
+    Индексы создаются миграцией foodgram 0008_recipe_search.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        queryset = search_postgresql(queryset, query)
+    elif vendor == 'sqlite' and sqlite3.sqlite_version_info >= (3, 34, 0):
+        trigrams = get_trigrams(query)
+        if not trigrams:
+            return queryset.filter(name__icontains=query)
+        queryset = search_sqlite(queryset, query, trigrams)
+    else:
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        )
+    return queryset.order_by('-search_rank', '-id')
@@ -1,12 +1,30 @@
+from collections import OrderedDict
+
 from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import permissions, serializers
 
 from foodgram.models import Favorite, Ingredient, Recipe, RecipeIngredient, Tag
 from users.serializers import CustomUserSerializer
 
+from .bulk import MAX_IDS
+from .cache import recipe_cache, user_membership
+from .shopping_list import update_cart_totals
+from .subscriptions import get_latest_recipes, get_recipes_limit
+
 User = get_user_model()
 
+RECIPE_PREFETCH = (
+    'author',
+    'tags',
+    Prefetch(
+        'recipeingredient_set',
+        queryset=RecipeIngredient.objects.select_related('ingredient')
+    )
+)
+
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
@@ -31,6 +49,55 @@ class IngredientsAmountSerializer(serializers.ModelSerializer):
         model = RecipeIngredient
 
 
+class ShoppingCartIngredientSerializer(serializers.Serializer):
+    id = serializers.IntegerField(source='ingredient')
+    name = serializers.CharField()
+    measurement_unit = serializers.CharField()
+    amount = serializers.IntegerField()
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_IDS
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
+class RecipeAuthorSerializer(serializers.ModelSerializer):
+    class Meta:
+        fields = ('email', 'id', 'username', 'first_name', 'last_name')
+        model = User
+
+
+class RecipeFragmentSerializer(serializers.ModelSerializer):
+    tags = TagSerializer(many=True, read_only=True)
+    author = RecipeAuthorSerializer(read_only=True)
+    ingredients = IngredientsAmountSerializer(
+        source='recipeingredient_set',
+        many=True,
+        read_only=True
+    )
+    image = serializers.ImageField(read_only=True)
+
+    class Meta:
+        fields = ('id', 'tags', 'author', 'ingredients', 'name', 'image',
+                  'text', 'cooking_time')
+        model = Recipe
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        recipes = list(data)
+        self.child.load_fragments(recipes)
+        return super().to_representation(recipes)
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.BooleanField(read_only=True, default=False)
     is_in_shopping_cart = serializers.BooleanField(
@@ -45,44 +112,100 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only=True
     )
     image = Base64ImageField()
+    favorites_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
                   'is_in_shopping_cart', 'name', 'image', 'text',
-                  'cooking_time')
+                  'cooking_time', 'favorites_count')
         model = Recipe
+        list_serializer_class = RecipeListSerializer
         permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
 
-    def validate(self, data):
-        data['author'] = self.context['request'].user
+    def load_fragments(self, recipes):
+        fragments = recipe_cache.get_many([recipe.pk for recipe in recipes])
+        misses = [recipe for recipe in recipes if recipe.pk not in fragments]
+        if misses:
+            prefetch_related_objects(misses, *RECIPE_PREFETCH)
+            serializer = RecipeFragmentSerializer()
+            missed = {
+                recipe.pk: serializer.to_representation(recipe)
+                for recipe in misses
+            }
+            recipe_cache.set_many(missed)
+            fragments.update(missed)
+        self.fragments = {**getattr(self, 'fragments', {}), **fragments}
+
+    def to_representation(self, instance):
+        if instance.pk not in getattr(self, 'fragments', {}):
+            self.load_fragments([instance])
+        fragment = self.fragments[instance.pk]
+        request = self.context.get('request')
+        membership = user_membership.for_request(request)
+        image = fragment['image']
+        if image:
+            image = request.build_absolute_uri(image)
+        user_fields = {
+            'author': OrderedDict(
+                fragment['author'],
+                is_subscribed=instance.author_id in membership.subscriptions
+            ),
+            'is_favorited': instance.pk in membership.favorites,
+            'is_in_shopping_cart': instance.pk in membership.shopping_cart,
+            'image': image,
+            'favorites_count': instance.favorites_count
+        }
+        return OrderedDict(
+            (field, user_fields.get(field, fragment.get(field)))
+            for field in self.Meta.fields
+        )
 
+    def get_valid_tags(self):
         tags = self.initial_data.get('tags')
         if not isinstance(tags, list):
             raise serializers.ValidationError('tags must be list')
-        for tag in tags:
-            if not Tag.objects.filter(id=tag).exists():
-                raise serializers.ValidationError('No tag')
-        data['tags'] = tags
+        try:
+            tags = list(dict.fromkeys(int(tag) for tag in tags))
+        except (TypeError, ValueError):
+            raise serializers.ValidationError('No tag')
+        if Tag.objects.filter(id__in=tags).count() != len(tags):
+            raise serializers.ValidationError('No tag')
+        return tags
 
+    def get_valid_ingredients(self):
+        """
+        Возвращает словарь ingredient_id → amount; существование
+        ингредиентов проверяется одним запросом.
+        """
         ingredients = self.initial_data.get('ingredients')
         if not isinstance(ingredients, list):
             raise serializers.ValidationError('ingredients must be list')
-        valid_ingredients = []
-        ingredient_objects = Ingredient.objects.filter(
-            id__in=[ingredient.get('id') for ingredient in ingredients]
-        )
-        if len(ingredient_objects) != len(ingredients):
-            raise serializers.ValidationError('invalid ingredient')
-        for ing_obj, ingredient in zip(ingredient_objects, ingredients):
-            amount = int(ingredient.get('amount'))
+        amounts = {}
+        for ingredient in ingredients:
+            try:
+                ingredient_id = int(ingredient.get('id'))
+                amount = int(ingredient.get('amount'))
+            except (AttributeError, TypeError, ValueError):
+                raise serializers.ValidationError('invalid ingredient')
+            if ingredient_id in amounts:
+                raise serializers.ValidationError('invalid ingredient')
             if amount < 1:
                 raise serializers.ValidationError('invalid amount')
-            valid_ingredients.append(
-                {'ingredient': ing_obj, 'amount': amount}
-            )
-        data['ingredients'] = valid_ingredients
+            amounts[ingredient_id] = amount
+        found = Ingredient.objects.filter(
+            id__in=amounts
+        ).values_list('id', flat=True)
+        if len(found) != len(amounts):
+            raise serializers.ValidationError('invalid ingredient')
+        return amounts
+
+    def validate(self, data):
+        data['author'] = self.context['request'].user
+        data['tags'] = self.get_valid_tags()
+        data['ingredients'] = self.get_valid_ingredients()
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -90,13 +213,55 @@ class RecipeSerializer(serializers.ModelSerializer):
         RecipeIngredient.objects.bulk_create([
             RecipeIngredient(
                 recipe=recipe,
-                ingredient=ingredient['ingredient'],
-                amount=ingredient['amount']
-            ) for ingredient in ingredients
+                ingredient_id=ingredient_id,
+                amount=amount
+            ) for ingredient_id, amount in ingredients.items()
         ])
         recipe.tags.set(tags)
         return recipe
 
+    def update_ingredients(self, instance, ingredients):
+        """
+        Приводит ингредиенты рецепта к словарю ingredient_id → amount,
+        выполняя только нужные DELETE, INSERT и UPDATE.
+        """
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=instance
+            ).only('id', 'ingredient_id', 'amount')
+        }
+        removed = current.keys() - ingredients.keys()
+        added = [
+            RecipeIngredient(
+                recipe=instance,
+                ingredient_id=ingredient_id,
+                amount=amount
+            )
+            for ingredient_id, amount in ingredients.items()
+            if ingredient_id not in current
+        ]
+        changed = []
+        for ingredient_id, amount in ingredients.items():
+            recipe_ingredient = current.get(ingredient_id)
+            if recipe_ingredient and recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if not (removed or added or changed):
+            return
+        update_cart_totals(instance.pk, -1)
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=instance,
+                ingredient__in=removed
+            ).delete()
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        update_cart_totals(instance.pk, 1)
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.get('ingredients')
         tags = validated_data.get('tags')
@@ -108,20 +273,10 @@ class RecipeSerializer(serializers.ModelSerializer):
                                                    instance.cooking_time)
 
         if tags:
-            instance.tags.clear()
             instance.tags.set(tags)
 
         if ingredients:
-            RecipeIngredient.objects.filter(recipe=instance).delete()
-            instance.ingredients.clear()
-            RecipeIngredient.objects.bulk_create([
-                RecipeIngredient(
-                    recipe=instance,
-                    ingredient=ingredient['ingredient'],
-                    amount=ingredient['amount']
-                )
-                for ingredient in ingredients
-            ])
+            self.update_ingredients(instance, ingredients)
         instance.save()
         return instance
 
@@ -145,11 +300,13 @@ class SubscribeSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField(read_only=True)
     recipes_count = serializers.SerializerMethodField(read_only=True)
+    followers_count = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
-                  'is_subscribed', 'recipes', 'recipes_count')
+                  'is_subscribed', 'recipes', 'recipes_count',
+                  'followers_count')
 
     def get_is_subscribed(self, obj):
         is_subscribed = self.context.get('is_subscribed')
@@ -158,14 +315,25 @@ class SubscribeSerializer(serializers.ModelSerializer):
         return obj.is_subscribed
 
     def get_recipes(self, obj):
-        recipes = Recipe.objects.filter(author=obj.author)
-        limit = self.context.get('request').GET.get('recipes_limit')
-        if limit:
-            recipes = recipes[:int(limit)]
-        return ShortRecipeSerializer(recipes, many=True).data
+        recipes = self.context.get('recipes')
+        if recipes is None:
+            recipes = get_latest_recipes(
+                [obj.author_id],
+                get_recipes_limit(self.context['request'])
+            )
+        return ShortRecipeSerializer(
+            recipes.get(obj.author_id, []),
+            many=True
+        ).data
 
     def get_recipes_count(self, obj):
         recipes_count = self.context.get('recipes_count')
         if recipes_count is not None:
             return recipes_count
         return obj.recipes_count
+
+    def get_followers_count(self, obj):
+        followers_count = self.context.get('followers_count')
+        if followers_count is not None:
+            return followers_count
+        return obj.followers_count
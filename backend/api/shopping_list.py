@@ -0,0 +1,165 @@
+import csv
+import json
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+
+from foodgram.models import (RecipeIngredient, ShoppingCartIngredient,
+                             ShoppingList)
+
+UPDATE_TOTALS_SQL = '''
+    INSERT INTO {totals} (user_id, ingredient_id, amount, recipes_count)
+    SELECT {user}, ri.ingredient_id,
+           %s * SUM(COALESCE(ri.amount, 0)), %s * COUNT(*)
+    FROM {recipe_ingredients} ri
+    {cart_join}
+    WHERE ri.recipe_id IN ({recipe_ids})
+    GROUP BY {group_by}
+    ON CONFLICT (user_id, ingredient_id) DO UPDATE
+    SET amount = {totals}.amount + EXCLUDED.amount,
+        recipes_count = {totals}.recipes_count + EXCLUDED.recipes_count
+'''
+
+
+def update_cart_totals(recipe_id, sign, user_id=None):
+    """
+    Прибавляет (sign=1) или вычитает (sign=-1) ингредиенты рецепта
+    из сводного списка покупок пользователя либо, если user_id не задан,
+    всех пользователей, у которых рецепт в корзине.
+
+    Для одного пользователя строка корзины не читается, поэтому
+    вычитать можно уже после её удаления.
+    """
+    update_cart_totals_many([recipe_id], sign, user_id)
+
+
+def update_cart_totals_many(recipe_ids, sign, user_id=None):
+    """То же, что update_cart_totals, для нескольких рецептов сразу."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    params = [sign, sign, *recipe_ids]
+    user = 'cart.user_id'
+    cart_join = (f'INNER JOIN {ShoppingList._meta.db_table} cart '
+                 'ON cart.recipe_id = ri.recipe_id')
+    group_by = 'cart.user_id, ri.ingredient_id'
+    if user_id is not None:
+        user = '%s'
+        cart_join = ''
+        group_by = 'ri.ingredient_id'
+        params.insert(0, user_id)
+    sql = UPDATE_TOTALS_SQL.format(
+        totals=ShoppingCartIngredient._meta.db_table,
+        recipe_ingredients=RecipeIngredient._meta.db_table,
+        user=user,
+        cart_join=cart_join,
+        recipe_ids=', '.join(['%s'] * len(recipe_ids)),
+        group_by=group_by
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+    if sign < 0:
+        totals = ShoppingCartIngredient.objects.filter(
+            recipes_count__lte=0,
+            ingredient__in=RecipeIngredient.objects.filter(
+                recipe__in=recipe_ids
+            ).values('ingredient')
+        )
+        if user_id is not None:
+            totals = totals.filter(user=user_id)
+        totals.delete()
+
+
+@contextmanager
+def recounting_cart_totals(recipe_ids):
+    """
+    Вычитает ингредиенты рецептов из сводных списков всех корзин
+    до изменения и прибавляет после него. Нужен для изменений состава
+    рецептов в обход API: в админке или через queryset.update().
+    """
+    recipe_ids = list(recipe_ids)
+    with transaction.atomic():
+        update_cart_totals_many(recipe_ids, -1)
+        yield
+        update_cart_totals_many(recipe_ids, 1)
+
+
+def subtract_cart_rows(rows):
+    """Вычитает удалённые строки корзины (user_id, recipe_id)."""
+    recipes = {}
+    for user_id, recipe_id in rows:
+        recipes.setdefault(user_id, []).append(recipe_id)
+    for user_id, recipe_ids in recipes.items():
+        update_cart_totals_many(recipe_ids, -1, user_id)
+
+
+def get_shopping_list(user):
+    return ShoppingCartIngredient.objects.filter(
+        user=user
+    ).values(
+        'ingredient',
+        'amount',
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit')
+    ).order_by('name', 'measurement_unit')
+
+
+def compute_shopping_list_totals():
+    return RecipeIngredient.objects.values(
+        'ingredient',
+        user=F('recipe__shopping_cart__user')
+    ).filter(
+        user__isnull=False
+    ).annotate(
+        amount=Sum('amount'),
+        recipes_count=Count('recipe')
+    ).order_by()
+
+
+def format_line(ingredient):
+    return (f'> {ingredient["name"]}({ingredient["measurement_unit"]}) — '
+            f'{ingredient["amount"]}')
+
+
+class EchoBuffer:
+    def write(self, value):
+        return value
+
+
+def stream_txt(title, ingredients):
+    yield f'{title}\n'
+    for ingredient in ingredients:
+        yield f'{format_line(ingredient)}\n'
+
+
+def stream_csv(title, ingredients):
+    writer = csv.writer(EchoBuffer())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['name'],
+            ingredient['measurement_unit'],
+            ingredient['amount']
+        ))
+
+
+def stream_json(title, ingredients):
+    separator = ''
+    yield '['
+    for ingredient in ingredients:
+        yield separator + json.dumps({
+            'id': ingredient['ingredient'],
+            'name': ingredient['name'],
+            'measurement_unit': ingredient['measurement_unit'],
+            'amount': ingredient['amount']
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+EXPORT_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', stream_txt),
+    'csv': ('text/csv; charset=utf-8', stream_csv),
+    'json': ('application/json', stream_json),
+}
@@ -0,0 +1,182 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from foodgram.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                             ShoppingList, Subscription, Tag, UserCounters)
+
+from .cache import data_versions, recipe_cache, token_cache, user_membership
+from .counters import update_favorites_count, update_user_counters
+from .feed import (backfill_feed, fan_out_recipe, get_loaded_feed_paused,
+                   remove_from_feed)
+from .search import trigram_coverage
+from .shopping_list import update_cart_totals
+
+User = get_user_model()
+
+
+def get_sqlite_function_options():
+    """Параметр deterministic у create_function есть с Python 3.8."""
+    if sys.version_info >= (3, 8):
+        return {'deterministic': True}
+    return {}
+
+
+@receiver(connection_created)
+def register_search_functions(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            'trigram_coverage',
+            2,
+            trigram_coverage,
+            **get_sqlite_function_options()
+        )
+
+
+def invalidate_recipes(pks):
+    recipe_cache.delete_many(pks)
+    data_versions.bump('recipes')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    invalidate_recipes([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(sender, instance, created, **kwargs):
+    if created:
+        update_user_counters(instance.author_id, recipes=1)
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        fan_out_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(sender, instance, **kwargs):
+    update_user_counters(instance.author_id, recipes=-1)
+
+
+@receiver(pre_delete, sender=Recipe)
+def subtract_deleted_recipe_from_carts(sender, instance, **kwargs):
+    update_cart_totals(instance.pk, -1)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def invalidate_recipe_ingredient(sender, instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidate_recipes([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_recipes(
+            instance.recipe_tags.values_list('pk', flat=True)
+        )
+    elif action in ('post_add', 'post_remove'):
+        invalidate_recipes(pk_set)
+
+
+@receiver((post_save, pre_delete), sender=Tag)
+def invalidate_tag(sender, instance, **kwargs):
+    data_versions.bump('tags')
+    invalidate_recipes(
+        Recipe.tags.through.objects.filter(
+            tag=instance.pk
+        ).values_list('recipe_id', flat=True)
+    )
+
+
+@receiver((post_save, pre_delete), sender=Ingredient)
+def invalidate_ingredient(sender, instance, **kwargs):
+    data_versions.bump('ingredients')
+    invalidate_recipes(
+        RecipeIngredient.objects.filter(
+            ingredient=instance.pk
+        ).values_list('recipe_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    invalidate_recipes(
+        Recipe.objects.filter(author=instance).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_save, sender=User)
+def evict_user_tokens(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    token_cache.delete_many(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Token)
+def evict_token(sender, instance, **kwargs):
+    token_cache.delete_many([instance.key])
+
+
+@receiver(post_save, sender=User)
+def create_user_counters(sender, instance, created, **kwargs):
+    if created:
+        UserCounters.objects.create(user=instance)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingList)
+@receiver((post_save, post_delete), sender=Subscription)
+def invalidate_membership(sender, instance, **kwargs):
+    user_membership.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Favorite)
+def count_added_favorite(sender, instance, created, **kwargs):
+    if created:
+        update_favorites_count(instance.recipe_id, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def count_removed_favorite(sender, instance, **kwargs):
+    update_favorites_count(instance.recipe_id, -1)
+
+
+@receiver(post_save, sender=Subscription)
+def count_added_subscription(sender, instance, created, **kwargs):
+    if created:
+        update_user_counters(instance.author_id, followers=1)
+
+
+@receiver(post_delete, sender=Subscription)
+def count_removed_subscription(sender, instance, **kwargs):
+    update_user_counters(instance.author_id, followers=-1)
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_subscriber_feed(sender, instance, created, **kwargs):
+    if created:
+        backfill_feed(
+            instance.user_id,
+            instance.author_id,
+            get_loaded_feed_paused(instance)
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def clear_subscriber_feed(sender, instance, **kwargs):
+    remove_from_feed(instance.user_id, instance.author_id)
@@ -0,0 +1,62 @@
+from collections import defaultdict
+
+from rest_framework.exceptions import ValidationError
+
+from foodgram.models import Recipe
+
+LATEST_RECIPES_SQL = '''
+    SELECT id, author_id, name, image, cooking_time
+    FROM (
+        SELECT id, author_id, name, image, cooking_time,
+               ROW_NUMBER() OVER (
+                   PARTITION BY author_id ORDER BY id DESC
+               ) AS position
+        FROM {recipes}
+        WHERE author_id IN ({author_ids})
+    ) ranked
+    WHERE position <= %s
+    ORDER BY author_id, position
+'''
+
+
+def get_recipes_limit(request):
+    limit = request.query_params.get('recipes_limit')
+    if limit is None or limit == '':
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        raise ValidationError(
+            {'recipes_limit': 'Ожидается неотрицательное целое число.'}
+        )
+    return limit
+
+
+def get_latest_recipes(author_ids, limit=None):
+    """
+    Возвращает словарь author_id → последние рецепты автора, не больше
+    limit на автора, одним запросом для всех авторов.
+    """
+    author_ids = list(author_ids)
+    if not author_ids:
+        return {}
+    if limit is None:
+        recipes = Recipe.objects.filter(
+            author__in=author_ids
+        ).only(
+            'id', 'author_id', 'name', 'image', 'cooking_time'
+        ).order_by('author', '-id')
+    else:
+        recipes = Recipe.objects.raw(
+            LATEST_RECIPES_SQL.format(
+                recipes=Recipe._meta.db_table,
+                author_ids=', '.join(['%s'] * len(author_ids))
+            ),
+            [*author_ids, limit]
+        )
+    latest = defaultdict(list)
+    for recipe in recipes:
+        latest[recipe.author_id].append(recipe)
+    return latest
@@ -0,0 +1,122 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.cache import TokenCache, token_cache
+
+User = get_user_model()
+
+URL = '/api/users/me/'
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword'
+        )
+
+    def setUp(self):
+        self.token = Token.objects.create(user=self.user)
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in context.captured_queries]
+
+    def test_second_request_skips_token_query(self):
+        """Повторный запрос с тем же токеном не читает authtoken_token."""
+        table = Token._meta.db_table
+        cold = self.count_queries()
+        warm = self.count_queries()
+        self.assertTrue(any(table in sql for sql in cold))
+        self.assertFalse(any(table in sql for sql in warm))
+        self.assertEqual(len(warm), len(cold) - 1)
+
+    def test_logout_evicts_token(self):
+        """После выхода токен сразу перестаёт действовать."""
+        self.client.get(URL)
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(URL).status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        """Отключённый пользователь не проходит по закэшированному токену."""
+        self.client.get(URL)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(URL).status_code, 401)
+
+    def test_unknown_token_is_not_cached(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token unknown')
+        self.assertEqual(client.get(URL).status_code, 401)
+        self.assertIsNone(token_cache.get('unknown'))
+
+    def test_shared_cache_is_used_after_local_miss(self):
+        """Процесс без локальной записи берёт токен из общего кэша."""
+        self.client.get(URL)
+        token_cache.entries.clear()
+        table = Token._meta.db_table
+        self.assertFalse(any(table in sql for sql in self.count_queries()))
+        self.token.delete()
+        self.assertEqual(self.client.get(URL).status_code, 401)
+
+
+class TokenCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(TOKEN_CACHE_SIZE=2)
+    def test_least_recently_used_entry_is_evicted(self):
+        tokens = TokenCache()
+        tokens.set('a', 1)
+        tokens.set('b', 2)
+        self.assertEqual(tokens.get_local('a'), 1)
+        tokens.set('c', 3)
+        self.assertIsNone(tokens.get_local('b'))
+        self.assertEqual(tokens.get_local('a'), 1)
+        self.assertEqual(tokens.get_local('c'), 3)
+        self.assertEqual(tokens.get('b'), 2)
+
+    @override_settings(TOKEN_CACHE_TIMEOUT=60)
+    def test_entry_expires(self):
+        tokens = TokenCache()
+        with mock.patch('api.cache.time.monotonic', return_value=100):
+            tokens.set('a', 1)
+        with mock.patch('api.cache.time.monotonic', return_value=159):
+            self.assertEqual(tokens.get_local('a'), 1)
+        with mock.patch('api.cache.time.monotonic', return_value=160):
+            self.assertIsNone(tokens.get_local('a'))
+        self.assertEqual(len(tokens.entries), 0)
+
+    def test_revocation_reaches_other_processes(self):
+        """Токен, отозванный в одном процессе, отклоняется и в других."""
+        worker, other_worker = TokenCache(), TokenCache()
+        worker.set('a', 1)
+        self.assertEqual(other_worker.get('a'), 1)
+        worker.delete_many(['a'])
+        self.assertIsNone(other_worker.get('a'))
+        self.assertNotIn('a', other_worker.entries)
+        other_worker.set('a', 1)
+        self.assertIsNone(worker.get('a'))
+
+    @override_settings(TOKEN_CACHE_ALIAS='')
+    def test_no_shared_cache_disables_caching(self):
+        tokens = TokenCache()
+        tokens.set('a', 1)
+        self.assertIsNone(tokens.get('a'))
+        self.assertEqual(len(tokens.entries), 0)
@@ -0,0 +1,204 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.bulk import MAX_IDS
+from api.counters import compute_favorites_counts, compute_user_counters
+from api.shopping_list import compute_shopping_list_totals
+from foodgram.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                             RecipeIngredient, ShoppingCartIngredient,
+                             ShoppingList, Subscription, UserCounters)
+
+User = get_user_model()
+
+
+class BulkMutationTests(TestCase):
+    recipes_count = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword'
+        )
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{index}',
+                password='testpassword'
+            ) for index in range(5)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient{index}',
+                measurement_unit='kg'
+            ) for index in range(3)
+        ]
+        cls.recipes = []
+        for index in range(cls.recipes_count):
+            recipe = Recipe.objects.create(
+                author=cls.authors[index % len(cls.authors)],
+                name=f'recipe{index}',
+                text='test',
+                image='test.png',
+                cooking_time=1
+            )
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=index + 1
+                ) for ingredient in ingredients[:index % 3 + 1]
+            ])
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_consistent(self):
+        self.assertEqual(
+            dict(Recipe.objects.exclude(
+                favorites_count=0
+            ).values_list('id', 'favorites_count')),
+            compute_favorites_counts()
+        )
+        self.assertEqual(
+            {
+                user_id: (recipes_count, followers_count)
+                for user_id, recipes_count, followers_count
+                in UserCounters.objects.exclude(
+                    recipes_count=0,
+                    followers_count=0
+                ).values_list('user', 'recipes_count', 'followers_count')
+            },
+            compute_user_counters()
+        )
+        self.assertEqual(
+            {
+                (row['user'], row['ingredient']): (
+                    row['amount'],
+                    row['recipes_count']
+                ) for row in compute_shopping_list_totals()
+            },
+            {
+                (row['user'], row['ingredient']): (
+                    row['amount'],
+                    row['recipes_count']
+                ) for row in ShoppingCartIngredient.objects.values(
+                    'user', 'ingredient', 'amount', 'recipes_count'
+                )
+            }
+        )
+
+    def test_bulk_favorite(self):
+        """Избранное пополняется и очищается списком id."""
+        url = '/api/recipes/favorite/bulk/'
+        first, second = self.recipes[:2]
+        self.client.post(f'/api/recipes/{first.id}/favorite/')
+        response = self.client.post(
+            url,
+            {'ids': [first.id, second.id, second.id, 10 ** 6]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'id': first.id, 'status': 'exists'},
+            {'id': second.id, 'status': 'added'},
+            {'id': 10 ** 6, 'status': 'not_found'},
+        ])
+        detail = self.client.get(f'/api/recipes/{second.id}/').json()
+        self.assertTrue(detail['is_favorited'])
+        self.assertEqual(detail['favorites_count'], 1)
+        self.assert_consistent()
+        response = self.client.delete(
+            url,
+            {'ids': [second.id, self.recipes[2].id]},
+            format='json'
+        )
+        self.assertEqual(response.json(), [
+            {'id': second.id, 'status': 'removed'},
+            {'id': self.recipes[2].id, 'status': 'absent'},
+        ])
+        self.assertEqual(
+            list(Favorite.objects.values_list('recipe', flat=True)),
+            [first.id]
+        )
+        detail = self.client.get(f'/api/recipes/{second.id}/').json()
+        self.assertFalse(detail['is_favorited'])
+        self.assert_consistent()
+
+    def test_bulk_shopping_cart(self):
+        """Корзина заполняется одним запросом с фиксированным числом SQL."""
+        url = '/api/recipes/shopping_cart/bulk/'
+        ids = [recipe.id for recipe in self.recipes]
+        self.client.post(f'/api/recipes/{ids[0]}/shopping_cart/')
+        with self.assertNumQueries(5):
+            response = self.client.post(url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        statuses = [result['status'] for result in response.json()]
+        self.assertEqual(statuses, ['exists'] + ['added'] * (len(ids) - 1))
+        self.assertEqual(ShoppingList.objects.count(), len(ids))
+        self.assert_consistent()
+        with self.assertNumQueries(6):
+            self.client.delete(url, {'ids': ids[::2]}, format='json')
+        self.assertEqual(ShoppingList.objects.count(), len(ids) // 2)
+        self.assert_consistent()
+
+    def test_bulk_subscribe(self):
+        """Подписки создаются и удаляются списком id авторов."""
+        url = '/api/users/subscribe/bulk/'
+        first, second = self.authors[:2]
+        response = self.client.post(
+            url,
+            {'ids': [first.id, second.id, self.user.id, 10 ** 6]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'id': first.id, 'status': 'added'},
+            {'id': second.id, 'status': 'added'},
+            {'id': self.user.id, 'status': 'self'},
+            {'id': 10 ** 6, 'status': 'not_found'},
+        ])
+        self.assertEqual(
+            set(FeedEntry.objects.filter(
+                user=self.user
+            ).values_list('recipe', flat=True)),
+            set(Recipe.objects.filter(
+                author__in=(first, second)
+            ).values_list('id', flat=True))
+        )
+        self.assert_consistent()
+        response = self.client.get('/api/users/subscriptions/')
+        self.assertEqual(len(response.json()['results']), 2)
+        response = self.client.delete(url, {'ids': [first.id]}, format='json')
+        self.assertEqual(
+            response.json(),
+            [{'id': first.id, 'status': 'removed'}]
+        )
+        self.assertEqual(
+            list(Subscription.objects.values_list('author', flat=True)),
+            [second.id]
+        )
+        self.assertFalse(
+            FeedEntry.objects.filter(recipe__author=first).exists()
+        )
+        self.assert_consistent()
+
+    def test_bulk_validation(self):
+        """Список id проверяется, а анонимам запросы недоступны."""
+        url = '/api/recipes/favorite/bulk/'
+        for ids in ([], ['x'], [0], list(range(1, MAX_IDS + 2))):
+            with self.subTest(ids=ids[:3]):
+                response = self.client.post(url, {'ids': ids}, format='json')
+                self.assertEqual(response.status_code, 400)
+        response = APIClient().post(url, {'ids': [1]}, format='json')
+        self.assertEqual(response.status_code, 401)
+        response = APIClient().post(
+            '/api/users/subscribe/bulk/',
+            {'ids': [1]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,321 @@
+import gzip
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.bulk import add_recipes
+from api.cache import (EMPTY_MEMBERSHIP, compress, data_versions, recipe_cache,
+                       user_membership)
+from foodgram.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                             ShoppingList, Subscription, Tag)
+
+User = get_user_model()
+
+
+class RecipeFragmentCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='author',
+            password='testpassword'
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword'
+        )
+        self.tag = Tag.objects.create(
+            name='test',
+            color='#FFFFFF',
+            slug='test'
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='test',
+            measurement_unit='kg'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author,
+            name='test',
+            text='test',
+            image='test.png',
+            cooking_time=1
+        )
+        self.recipe_ingredient = RecipeIngredient.objects.create(
+            recipe=self.recipe,
+            ingredient=self.ingredient,
+            amount=1
+        )
+        self.recipe.tags.set([self.tag])
+        self.url = f'/api/recipes/{self.recipe.id}/'
+        self.not_authorized_client = APIClient()
+        self.authorized_client = APIClient()
+        auth_token = Token.objects.get_or_create(user=self.user)
+        auth_token = f'Token {str(auth_token[0])}'
+        self.authorized_client.credentials(HTTP_AUTHORIZATION=auth_token)
+
+    def get_recipe(self, client=None):
+        client = client or self.not_authorized_client
+        return client.get(self.url).json()
+
+    def test_repeated_read_is_served_from_cache(self):
+        """Повторное чтение рецепта берётся из кэша."""
+        self.get_recipe()
+        self.assertEqual(recipe_cache.stats(), {'hits': 0, 'misses': 1})
+        self.get_recipe()
+        self.assertEqual(recipe_cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_user_flags_are_not_cached(self):
+        """Пользовательские флаги подставляются поверх общего фрагмента."""
+        self.get_recipe()
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        Subscription.objects.create(user=self.user, author=self.author)
+        recipe = self.get_recipe(self.authorized_client)
+        self.assertTrue(recipe['is_favorited'])
+        self.assertFalse(recipe['is_in_shopping_cart'])
+        self.assertTrue(recipe['author']['is_subscribed'])
+        self.assertTrue(recipe['image'].startswith('http://testserver/'))
+        recipe = self.get_recipe()
+        self.assertFalse(recipe['is_favorited'])
+        self.assertFalse(recipe['author']['is_subscribed'])
+
+    def test_cache_invalidation(self):
+        """Изменение рецепта и связанных объектов сбрасывает кэш."""
+        def rename_recipe():
+            self.recipe.name = 'new'
+            self.recipe.save()
+
+        def change_amount():
+            self.recipe_ingredient.amount = 5
+            self.recipe_ingredient.save()
+
+        def rename_tag():
+            self.tag.name = 'new'
+            self.tag.save()
+
+        def remove_tags():
+            self.tag.recipe_tags.clear()
+
+        def rename_author():
+            self.author.first_name = 'new'
+            self.author.save()
+
+        checks = (
+            (rename_recipe, lambda data: data['name'] == 'new'),
+            (change_amount,
+             lambda data: data['ingredients'][0]['amount'] == 5),
+            (rename_tag, lambda data: data['tags'][0]['name'] == 'new'),
+            (remove_tags, lambda data: data['tags'] == []),
+            (rename_author,
+             lambda data: data['author']['first_name'] == 'new'),
+        )
+        for change, check in checks:
+            self.get_recipe()
+            change()
+            with self.subTest(change=change.__name__):
+                self.assertTrue(check(self.get_recipe()))
+
+    def test_membership_follows_user_actions(self):
+        """Флаги пользователя обновляются после добавления и удаления."""
+        actions = (
+            (f'{self.url}favorite/', 'is_favorited'),
+            (f'{self.url}shopping_cart/', 'is_in_shopping_cart'),
+        )
+        for url, flag in actions:
+            self.assertFalse(self.get_recipe(self.authorized_client)[flag])
+            self.authorized_client.post(url)
+            with self.subTest(flag=flag, action='post'):
+                self.assertTrue(self.get_recipe(self.authorized_client)[flag])
+            self.authorized_client.delete(url)
+            with self.subTest(flag=flag, action='delete'):
+                self.assertFalse(
+                    self.get_recipe(self.authorized_client)[flag]
+                )
+        subscribe_url = f'/api/users/{self.author.id}/subscribe/'
+        self.authorized_client.post(subscribe_url)
+        recipe = self.get_recipe(self.authorized_client)
+        self.assertTrue(recipe['author']['is_subscribed'])
+
+
+class MembershipInvalidationTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user,
+            name='test',
+            text='test',
+            image='test.png',
+            cooking_time=1
+        )
+
+    def cache_stale_membership(self):
+        """Запись параллельного читателя, видевшего данные до фиксации."""
+        user_membership.cache.set(
+            user_membership.make_key(self.user.pk),
+            EMPTY_MEMBERSHIP
+        )
+
+    def test_stale_sets_are_dropped_after_commit(self):
+        """Множества, закэшированные до фиксации, сбрасываются после неё."""
+        adds = (
+            ('signal', lambda: Favorite.objects.create(
+                user=self.user,
+                recipe=self.recipe
+            )),
+            ('bulk', lambda: add_recipes(
+                ShoppingList,
+                self.user,
+                [self.recipe.pk]
+            )),
+        )
+        for name, add in adds:
+            with transaction.atomic():
+                add()
+                self.cache_stale_membership()
+            with self.subTest(path=name):
+                self.assertNotEqual(
+                    user_membership.get(self.user),
+                    EMPTY_MEMBERSHIP
+                )
+            user_membership.delete(self.user.pk)
+            Favorite.objects.all().delete()
+            ShoppingList.objects.all().delete()
+
+
+class RenderedResponseCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'ingredient{index}', measurement_unit='kg')
+            for index in range(50)
+        ])
+        self.client = APIClient()
+
+    def test_unfiltered_list_is_served_without_queries(self):
+        """Повторный запрос списка не обращается к базе данных."""
+        expected = self.client.get('/api/ingredients/').json()
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/ingredients/')
+        self.assertEqual(response.json(), expected)
+        self.assertEqual(len(expected), 50)
+
+    def test_gzip_variant(self):
+        """Клиенту, принимающему gzip, отдаётся сжатый вариант."""
+        plain = self.client.get('/api/ingredients/')
+        compressed = self.client.get(
+            '/api/ingredients/',
+            HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertLess(len(compressed.content), len(plain.content))
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertNotEqual(compressed['ETag'], plain['ETag'])
+
+    def test_compressed_bytes_do_not_depend_on_time(self):
+        """Сжатый вариант не содержит времени и воспроизводим."""
+        content = b'ingredient' * 100
+        with mock.patch('time.time', return_value=10 ** 9):
+            first = compress(content)
+        self.assertEqual(first, compress(content))
+        self.assertEqual(first[4:8], bytes(4))
+        self.assertEqual(gzip.decompress(first), content)
+
+    def test_version_bump_invalidates_list(self):
+        """Изменение данных и импорт сбрасывают кэш списка."""
+        self.client.get('/api/tags/')
+        Tag.objects.create(name='new', color='#000000', slug='new')
+        self.assertEqual(len(self.client.get('/api/tags/').json()), 1)
+        self.client.get('/api/ingredients/')
+        Ingredient.objects.filter(name='ingredient0').update(name='renamed')
+        self.assertNotIn(
+            'renamed',
+            [item['name'] for item in self.client.get(
+                '/api/ingredients/'
+            ).json()]
+        )
+        data_versions.bump('ingredients')
+        self.assertIn(
+            'renamed',
+            [item['name'] for item in self.client.get(
+                '/api/ingredients/'
+            ).json()]
+        )
+
+    def test_filtered_list_is_not_cached(self):
+        """Списки с параметрами запроса не берутся из кэша."""
+        self.client.get('/api/ingredients/')
+        response = self.client.get(
+            '/api/ingredients/',
+            {'name': 'ingredient4', 'limit': 1}
+        )
+        self.assertEqual(
+            [item['name'] for item in response.json()],
+            ['ingredient4']
+        )
+
+
+FILE_CACHE = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+class SharedCacheTests(TestCase):
+    """Сброс версий в другом процессе виден через общий кэш."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = directory.name
+        settings_override = override_settings(CACHES={
+            'default': {'BACKEND': FILE_CACHE, 'LOCATION': self.location}
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+
+    def run_in_other_process(self, code):
+        subprocess.run(
+            [sys.executable, 'manage.py', 'shell', '-c', code],
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                'CACHE_BACKEND': FILE_CACHE,
+                'CACHE_LOCATION': self.location,
+            },
+            check=True,
+            stdout=subprocess.DEVNULL
+        )
+
+    def test_version_bump_from_another_process(self):
+        """Импорт в отдельном процессе сбрасывает кэш списка и ETag."""
+        Ingredient.objects.create(name='salt', measurement_unit='g')
+        response = self.client.get('/api/ingredients/')
+        self.assertEqual(len(response.json()), 1)
+        etag = response['ETag']
+        Ingredient.objects.bulk_create([
+            Ingredient(name='sugar', measurement_unit='g')
+        ])
+        self.run_in_other_process(
+            'from api.cache import data_versions; '
+            'data_versions.bump("ingredients")'
+        )
+        response = self.client.get(
+            '/api/ingredients/',
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
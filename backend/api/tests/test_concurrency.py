@@ -0,0 +1,162 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from foodgram.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                             ShoppingCartIngredient, ShoppingList,
+                             Subscription, UserCounters)
+
+User = get_user_model()
+
+
+class ConcurrentToggleTests(TransactionTestCase):
+    threads_count = 8
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('SQLite в памяти не ждёт блокировок таблиц')
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword'
+        )
+        self.author = User.objects.create_user(
+            username='author',
+            password='testpassword'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author,
+            name='recipe',
+            text='test',
+            image='test.png',
+            cooking_time=1
+        )
+        RecipeIngredient.objects.create(
+            recipe=self.recipe,
+            ingredient=Ingredient.objects.create(
+                name='ingredient',
+                measurement_unit='kg'
+            ),
+            amount=2
+        )
+
+    def post_concurrently(self, url, bulk_url=None, pk=None):
+        """
+        Отправляет запросы одновременно из нескольких потоков;
+        если задан bulk_url, каждый второй поток добавляет pk
+        массовым запросом.
+        """
+        barrier = threading.Barrier(self.threads_count)
+        statuses = []
+
+        def post(url, data=None):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            barrier.wait()
+            try:
+                statuses.append(
+                    client.post(url, data, format='json').status_code
+                )
+            except DatabaseError:
+                statuses.append(500)
+            finally:
+                connection.close()
+
+        requests = [(url, None)] * self.threads_count
+        if bulk_url is not None:
+            requests[1::2] = [(bulk_url, {'ids': [pk]})] * (
+                self.threads_count // 2
+            )
+        threads = [
+            threading.Thread(target=post, args=request)
+            for request in requests
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(statuses)
+
+    def assert_added_once(self, statuses):
+        self.assertEqual(
+            statuses,
+            [201] + [400] * (self.threads_count - 1)
+        )
+
+    def test_favorite(self):
+        """Параллельные запросы добавляют рецепт в избранное один раз."""
+        self.assert_added_once(
+            self.post_concurrently(f'/api/recipes/{self.recipe.id}/favorite/')
+        )
+        self.assertEqual(Favorite.objects.count(), 1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+
+    def test_shopping_cart(self):
+        """Параллельные запросы добавляют рецепт в корзину один раз."""
+        self.assert_added_once(self.post_concurrently(
+            f'/api/recipes/{self.recipe.id}/shopping_cart/'
+        ))
+        self.assertEqual(ShoppingList.objects.count(), 1)
+        self.assertEqual(
+            list(ShoppingCartIngredient.objects.values_list(
+                'amount',
+                'recipes_count'
+            )),
+            [(2, 1)]
+        )
+
+    def test_subscribe(self):
+        """Параллельные запросы создают одну подписку."""
+        self.assert_added_once(
+            self.post_concurrently(f'/api/users/{self.author.id}/subscribe/')
+        )
+        self.assertEqual(Subscription.objects.count(), 1)
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).followers_count,
+            1
+        )
+
+    def test_bulk_and_single_favorite(self):
+        """Массовое и одиночное добавление не считают рецепт дважды."""
+        statuses = self.post_concurrently(
+            f'/api/recipes/{self.recipe.id}/favorite/',
+            '/api/recipes/favorite/bulk/',
+            self.recipe.id
+        )
+        self.assertTrue(all(status < 500 for status in statuses))
+        self.assertEqual(Favorite.objects.count(), 1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+
+    def test_bulk_and_single_shopping_cart(self):
+        """Итоги корзины учитывают рецепт один раз."""
+        statuses = self.post_concurrently(
+            f'/api/recipes/{self.recipe.id}/shopping_cart/',
+            '/api/recipes/shopping_cart/bulk/',
+            self.recipe.id
+        )
+        self.assertTrue(all(status < 500 for status in statuses))
+        self.assertEqual(ShoppingList.objects.count(), 1)
+        self.assertEqual(
+            list(ShoppingCartIngredient.objects.values_list(
+                'amount',
+                'recipes_count'
+            )),
+            [(2, 1)]
+        )
+
+    def test_bulk_and_single_subscribe(self):
+        statuses = self.post_concurrently(
+            f'/api/users/{self.author.id}/subscribe/',
+            '/api/users/subscribe/bulk/',
+            self.author.id
+        )
+        self.assertTrue(all(status < 500 for status in statuses))
+        self.assertEqual(Subscription.objects.count(), 1)
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).followers_count,
+            1
+        )
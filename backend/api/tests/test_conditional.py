@@ -0,0 +1,135 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from foodgram.models import Favorite, Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword'
+        )
+        self.tag = Tag.objects.create(
+            name='test',
+            color='#FFFFFF',
+            slug='test'
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='test',
+            measurement_unit='kg'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user,
+            name='test',
+            text='test',
+            image='test.png',
+            cooking_time=1
+        )
+        self.not_authorized_client = APIClient()
+        self.authorized_client = APIClient()
+        auth_token = Token.objects.get_or_create(user=self.user)
+        auth_token = f'Token {str(auth_token[0])}'
+        self.authorized_client.credentials(HTTP_AUTHORIZATION=auth_token)
+
+    def test_not_modified(self):
+        """Повторный запрос с If-None-Match получает 304 без запросов к БД."""
+        urls = (
+            '/api/tags/',
+            f'/api/tags/{self.tag.id}/',
+            '/api/ingredients/',
+            f'/api/ingredients/{self.ingredient.id}/',
+            '/api/recipes/',
+            f'/api/recipes/{self.recipe.id}/',
+        )
+        for url in urls:
+            response = self.not_authorized_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('Last-Modified', response)
+            with self.subTest(url=url), self.assertNumQueries(0):
+                response = self.not_authorized_client.get(
+                    url,
+                    HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since_is_ignored(self):
+        """Изменение в ту же секунду не скрывается ответом 304."""
+        response = self.not_authorized_client.get(
+            '/api/tags/',
+            HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_changes_with_data(self):
+        """ETag меняется при изменении данных."""
+        checks = (
+            ('/api/tags/', lambda: Tag.objects.create(
+                name='new', color='#000000', slug='new'
+            )),
+            ('/api/ingredients/', lambda: Ingredient.objects.create(
+                name='new', measurement_unit='kg'
+            )),
+            ('/api/recipes/', lambda: self.recipe.tags.add(self.tag)),
+        )
+        for url, change in checks:
+            etag = self.not_authorized_client.get(url)['ETag']
+            change()
+            response = self.not_authorized_client.get(
+                url,
+                HTTP_IF_NONE_MATCH=etag
+            )
+            with self.subTest(url=url):
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user_membership(self):
+        """ETag рецептов учитывает избранное и корзину пользователя."""
+        url = f'/api/recipes/{self.recipe.id}/'
+        etag = self.authorized_client.get(url)['ETag']
+        self.assertNotEqual(etag, self.not_authorized_client.get(url)['ETag'])
+        self.authorized_client.post(f'{url}favorite/')
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_favorited'])
+
+    def test_favorite_changes_only_its_recipe(self):
+        """Избранное меняет ETag своего рецепта и не трогает остальные."""
+        other = Recipe.objects.create(
+            author=self.user,
+            name='other',
+            text='test',
+            image='test.png',
+            cooking_time=1
+        )
+        url = f'/api/recipes/{self.recipe.id}/'
+        other_url = f'/api/recipes/{other.id}/'
+        etag = self.not_authorized_client.get(url)['ETag']
+        other_etag = self.not_authorized_client.get(other_url)['ETag']
+        list_etag = self.not_authorized_client.get('/api/recipes/')['ETag']
+        self.not_authorized_client.get('/api/recipes/tag_counts/')
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        response = self.not_authorized_client.get(
+            url,
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['favorites_count'], 1)
+        response = self.not_authorized_client.get(
+            other_url,
+            HTTP_IF_NONE_MATCH=other_etag
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.not_authorized_client.get(
+            '/api/recipes/',
+            HTTP_IF_NONE_MATCH=list_etag
+        )
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            self.not_authorized_client.get('/api/recipes/tag_counts/')
@@ -0,0 +1,111 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from foodgram.models import Favorite, Recipe, Subscription, UserCounters
+
+User = get_user_model()
+
+
+class CounterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword'
+        )
+        self.authors = [
+            User.objects.create_user(
+                username=f'author{index}',
+                password='testpassword'
+            ) for index in range(2)
+        ]
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.authors[index % 2],
+                name=f'recipe{index}',
+                text='test',
+                image='test.png',
+                cooking_time=1
+            ) for index in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_counters(self, user):
+        counters = UserCounters.objects.get(user=user)
+        return counters.recipes_count, counters.followers_count
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются вместе с рецептами, избранным и подписками."""
+        self.assertEqual(self.get_counters(self.authors[0]), (2, 0))
+        recipe = self.recipes[0]
+        self.client.post(f'/api/recipes/{recipe.id}/favorite/')
+        self.client.post(f'/api/users/{self.authors[0].id}/subscribe/')
+        response = self.client.get(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response.json()['favorites_count'], 1)
+        self.assertEqual(self.get_counters(self.authors[0]), (2, 1))
+        self.client.delete(f'/api/recipes/{recipe.id}/favorite/')
+        self.client.delete(f'/api/users/{self.authors[0].id}/subscribe/')
+        recipe.delete()
+        self.assertEqual(self.get_counters(self.authors[0]), (1, 0))
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_subscriptions_expose_and_sort_by_counters(self):
+        """Подписки показывают счётчики и сортируются по ним."""
+        for author in self.authors:
+            Subscription.objects.create(user=self.user, author=author)
+        response = self.client.get(
+            '/api/users/subscriptions/',
+            {'ordering': 'recipes_count'}
+        )
+        results = response.json()['results']
+        self.assertEqual(
+            [(item['id'], item['recipes_count'], item['followers_count'])
+             for item in results],
+            [(self.authors[1].id, 1, 1), (self.authors[0].id, 2, 1)]
+        )
+
+    def test_recipes_sort_by_favorites_count(self):
+        """Рецепты сортируются по количеству добавлений в избранное."""
+        Favorite.objects.create(user=self.user, recipe=self.recipes[0])
+        Favorite.objects.create(user=self.authors[0], recipe=self.recipes[0])
+        Favorite.objects.create(user=self.user, recipe=self.recipes[1])
+        response = self.client.get(
+            '/api/recipes/',
+            {'ordering': '-favorites_count'}
+        )
+        self.assertEqual(
+            [item['name'] for item in response.json()['results']],
+            ['recipe0', 'recipe1', 'recipe2']
+        )
+        response = self.client.get(
+            '/api/recipes/',
+            {'ordering': '-favorites_count', 'cursor': '', 'limit': 2}
+        )
+        self.assertEqual(
+            [item['favorites_count'] for item in response.json()['results']],
+            [2, 1]
+        )
+
+    def test_repair_command(self):
+        """Команда проверки находит и исправляет расхождения."""
+        Recipe.objects.filter(pk=self.recipes[0].pk).update(
+            favorites_count=5
+        )
+        UserCounters.objects.filter(user=self.authors[1]).delete()
+        output = StringIO()
+        call_command('check_counters', '--fix', stdout=output)
+        self.assertIn('пользователи 1, рецепты 1, исправлено',
+                      output.getvalue())
+        self.recipes[0].refresh_from_db()
+        self.assertEqual(self.recipes[0].favorites_count, 0)
+        self.assertEqual(self.get_counters(self.authors[1]), (1, 0))
+        output = StringIO()
+        call_command('check_counters', stdout=output)
+        self.assertIn('пользователи 0, рецепты 0', output.getvalue())
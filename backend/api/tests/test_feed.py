@@ -0,0 +1,209 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from foodgram.models import FeedEntry, Recipe, Subscription
+
+User = get_user_model()
+
+
+class FeedTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword'
+        )
+        self.authors = [
+            User.objects.create_user(
+                username=f'author{index}',
+                password='testpassword'
+            ) for index in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, author, name):
+        return Recipe.objects.create(
+            author=author,
+            name=name,
+            text='test',
+            image='test.png',
+            cooking_time=1
+        )
+
+    def walk(self, url='/api/recipes/feed/?limit=2'):
+        names = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            names.extend(recipe['name'] for recipe in data['results'])
+            url = data['next']
+        return names
+
+    def test_feed_follows_subscriptions(self):
+        """Лента содержит рецепты авторов, на которых подписан пользователь."""
+        old = self.create_recipe(self.authors[0], 'old')
+        Subscription.objects.create(user=self.user, author=self.authors[0])
+        Subscription.objects.create(user=self.user, author=self.authors[1])
+        self.create_recipe(self.authors[1], 'first')
+        self.create_recipe(self.authors[2], 'not followed')
+        self.create_recipe(self.authors[0], 'second')
+        self.create_recipe(self.authors[1], 'third')
+        self.assertEqual(self.walk(), ['third', 'second', 'first', 'old'])
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, recipe=old).exists()
+        )
+        Subscription.objects.filter(author=self.authors[1]).delete()
+        self.assertEqual(self.walk(), ['second', 'old'])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_popular_authors_are_merged_on_read(self):
+        """Рецепты авторов с большим числом подписчиков читаются отдельно."""
+        follower = User.objects.create_user(
+            username='follower',
+            password='testpassword'
+        )
+        Subscription.objects.create(user=follower, author=self.authors[0])
+        Subscription.objects.create(user=self.user, author=self.authors[0])
+        Subscription.objects.create(user=self.user, author=self.authors[1])
+        self.create_recipe(self.authors[0], 'popular')
+        self.create_recipe(self.authors[1], 'regular')
+        self.create_recipe(self.authors[0], 'popular again')
+        self.assertFalse(
+            FeedEntry.objects.filter(recipe__author=self.authors[0]).exists()
+        )
+        self.assertEqual(
+            self.walk(),
+            ['popular again', 'regular', 'popular']
+        )
+
+    def check_resumed_fan_out(self, unsubscribe):
+        follower = User.objects.create_user(
+            username='follower',
+            password='testpassword'
+        )
+        with override_settings(
+            FEED_FANOUT_MAX_FOLLOWERS=1,
+            FEED_FANOUT_RESUME_FOLLOWERS=1
+        ):
+            Subscription.objects.create(
+                user=follower,
+                author=self.authors[0]
+            )
+            Subscription.objects.create(
+                user=self.user,
+                author=self.authors[0]
+            )
+            self.create_recipe(self.authors[0], 'popular')
+            self.assertFalse(FeedEntry.objects.exists())
+            with CaptureQueriesContext(connection) as context:
+                unsubscribe(follower)
+            self.assertFalse(any(
+                'INSERT' in query['sql'] and 'feedentry' in query['sql']
+                for query in context.captured_queries
+            ))
+            self.assertFalse(FeedEntry.objects.exists())
+            self.assertEqual(self.walk(), ['popular'])
+            output = StringIO()
+            call_command('resume_feed_fan_out', stdout=output)
+            self.assertIn('1', output.getvalue())
+            self.assertTrue(FeedEntry.objects.filter(
+                user=self.user,
+                recipe__name='popular'
+            ).exists())
+            self.create_recipe(self.authors[0], 'regular again')
+            self.assertEqual(self.walk(), ['regular again', 'popular'])
+
+    def test_fan_out_resumes_after_unsubscribe(self):
+        """Автор, вернувшийся к раскладке, не пропадает из лент."""
+        def unsubscribe(follower):
+            client = APIClient()
+            client.force_authenticate(follower)
+            response = client.delete(
+                f'/api/users/{self.authors[0].id}/subscribe/'
+            )
+            self.assertEqual(response.status_code, 204)
+
+        self.check_resumed_fan_out(unsubscribe)
+
+    def test_fan_out_resumes_after_bulk_unsubscribe(self):
+        def unsubscribe(follower):
+            client = APIClient()
+            client.force_authenticate(follower)
+            response = client.delete(
+                '/api/users/subscribe/bulk/',
+                {'ids': [self.authors[0].id]},
+                format='json'
+            )
+            self.assertEqual(response.status_code, 200)
+
+        self.check_resumed_fan_out(unsubscribe)
+
+    @override_settings(
+        FEED_FANOUT_MAX_FOLLOWERS=2,
+        FEED_FANOUT_RESUME_FOLLOWERS=1
+    )
+    def test_fan_out_resumes_below_threshold(self):
+        """Отписка у самой границы не возвращает автора к раскладке."""
+        followers = [
+            User.objects.create_user(
+                username=f'follower{index}',
+                password='testpassword'
+            ) for index in range(3)
+        ]
+        for follower in followers:
+            Subscription.objects.create(user=follower, author=self.authors[0])
+        Subscription.objects.filter(user=followers[0]).delete()
+        call_command('resume_feed_fan_out', stdout=StringIO())
+        counters = self.authors[0].counters
+        counters.refresh_from_db()
+        self.assertTrue(counters.feed_paused)
+        Subscription.objects.filter(user=followers[1]).delete()
+        call_command('resume_feed_fan_out', stdout=StringIO())
+        counters.refresh_from_db()
+        self.assertFalse(counters.feed_paused)
+
+    def test_trim_feeds(self):
+        """Команда trim_feeds оставляет в ленте только последние записи."""
+        Subscription.objects.create(user=self.user, author=self.authors[0])
+        for index in range(4):
+            self.create_recipe(self.authors[0], f'recipe {index}')
+        output = StringIO()
+        call_command('trim_feeds', '--max-size', '2', stdout=output)
+        self.assertIn('2', output.getvalue())
+        self.assertEqual(
+            list(FeedEntry.objects.order_by('-recipe_id').values_list(
+                'recipe__name', flat=True
+            )),
+            ['recipe 3', 'recipe 2']
+        )
+
+    def test_feed_query_count_does_not_depend_on_authors(self):
+        """Страница ленты загружается фиксированным числом запросов."""
+        for author in self.authors:
+            Subscription.objects.create(user=self.user, author=author)
+            self.create_recipe(author, author.username)
+        counts = []
+        for limit in (1, 3):
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(f'/api/recipes/feed/?limit={limit}')
+            self.assertEqual(len(response.json()['results']), limit)
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_feed_validation(self):
+        """Лента доступна только авторизованным и проверяет курсор."""
+        response = self.client.get('/api/recipes/feed/', {'before': 'x'})
+        self.assertEqual(response.status_code, 400)
+        response = APIClient().get('/api/recipes/feed/')
+        self.assertEqual(response.status_code, 401)
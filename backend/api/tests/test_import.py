@@ -0,0 +1,394 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.cache import data_versions
+from api.recipe_import import RecipeImporter
+from foodgram.management.commands import import_ingredients
+from foodgram.models import (FeedEntry, Ingredient, Recipe, RecipeIngredient,
+                             Subscription, Tag, UserCounters)
+
+User = get_user_model()
+
+
+class ImportIngredientsTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, filename, content):
+        path = os.path.join(self.directory.name, filename)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def run_import(self, *args):
+        output = StringIO()
+        call_command('import_ingredients', *args, stdout=output)
+        return output.getvalue()
+
+    def test_csv_import_is_idempotent(self):
+        """Повторный импорт не создаёт дубликатов."""
+        path = self.write(
+            'ingredients.csv',
+            'name,measurement_unit\nсоль,г\nсахар,г\nсоль,г\nсоль,щепотка\n'
+        )
+        output = self.run_import(path, '--batch-size', '2')
+        self.assertIn('Добавлено: 3, пропущено: 1', output)
+        output = self.run_import(path)
+        self.assertIn('Добавлено: 0, пропущено: 4', output)
+        self.assertEqual(Ingredient.objects.count(), 3)
+
+    def test_json_is_read_in_chunks(self):
+        """Массив JSON разбирается по частям."""
+        path = self.write('ingredients.json', json.dumps([
+            {'name': f'ингредиент {index}', 'measurement_unit': 'г'}
+            for index in range(20)
+        ], ensure_ascii=False))
+        with mock.patch.object(import_ingredients, 'CHUNK_SIZE', 7):
+            output = self.run_import(path)
+        self.assertIn('Добавлено: 20, пропущено: 0', output)
+        self.assertTrue(
+            Ingredient.objects.filter(name='ингредиент 19').exists()
+        )
+
+    def test_escaped_json_is_read_in_small_chunks(self):
+        """Граница части внутри \\uXXXX не считается ошибкой."""
+        path = self.write('ingredients.json', json.dumps([
+            {'name': f'ингредиент {index}', 'measurement_unit': 'г'}
+            for index in range(20)
+        ]))
+        for chunk_size in (3, 5, 7):
+            Ingredient.objects.all().delete()
+            with self.subTest(chunk_size=chunk_size), mock.patch.object(
+                import_ingredients,
+                'CHUNK_SIZE',
+                chunk_size
+            ):
+                output = self.run_import(path)
+                self.assertIn('Добавлено: 20, пропущено: 0', output)
+                self.assertTrue(
+                    Ingredient.objects.filter(name='ингредиент 19').exists()
+                )
+
+    def test_truncated_json_is_rejected(self):
+        """Оборванный JSON не загружается."""
+        path = self.write(
+            'ingredients.json',
+            '[{"name": "соль", "measurement_unit": "г"}, {"name": "сах'
+        )
+        with self.assertRaises(CommandError):
+            self.run_import(path)
+        self.assertFalse(Ingredient.objects.exists())
+
+    def test_invalid_json_items_are_reported(self):
+        """Испорченный элемент называется по номеру, а не как обрыв файла."""
+        cases = (
+            ('[{"name": "соль", "measurement_unit": "г"}, 5]',
+             'Элемент 1: ожидался объект'),
+            ('[{"name": "соль"}]', 'Элемент 0: ожидался объект'),
+            ('[{"name": "соль", "measurement_unit": "г"} {"name" 1}]',
+             'Элемент 1: неверный JSON'),
+            ('[{"name": "соль", "measurement_unit": "г"}, {"name": "сах',
+             'Файл JSON обрывается на элементе 1'),
+        )
+        for content, message in cases:
+            path = self.write('ingredients.json', content)
+            with self.subTest(content=content):
+                with self.assertRaisesMessage(CommandError, message):
+                    self.run_import(path)
+        self.assertFalse(Ingredient.objects.exists())
+
+    def test_legacy_command_name(self):
+        """Прежнее имя from_csv_to_db работает с прежними флагами."""
+        path = self.write('ingredients.csv', 'соль,г\n')
+        output = StringIO()
+        call_command('from_csv_to_db', path, '--no-input', stdout=output)
+        self.assertIn('Добавлено: 1', output.getvalue())
+
+    def test_import_bumps_ingredient_version(self):
+        """Импорт сбрасывает версию данных ингредиентов."""
+        version = data_versions.get_many(['ingredients'])['ingredients']
+        self.run_import(self.write('ingredients.csv', 'соль,г\n'))
+        self.assertGreater(
+            data_versions.get_many(['ingredients'])['ingredients'],
+            version
+        )
+
+
+class ImportRecipesTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.media = os.path.join(self.directory.name, 'media')
+        os.makedirs(os.path.join(self.media, 'import'))
+        media_settings = override_settings(
+            MEDIA_ROOT=self.media,
+            RECIPE_IMPORT_ROOT=os.path.join(self.media, 'import')
+        )
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.author = User.objects.create_user(
+            username='author',
+            password='testpassword'
+        )
+        self.follower = User.objects.create_user(
+            username='follower',
+            password='testpassword'
+        )
+        Subscription.objects.create(user=self.follower, author=self.author)
+        Tag.objects.create(name='Завтрак', color='#000001', slug='breakfast')
+        Tag.objects.create(name='Обед', color='#000002', slug='lunch')
+        Ingredient.objects.bulk_create([
+            Ingredient(name='соль', measurement_unit='г'),
+            Ingredient(name='соль', measurement_unit='щепотка'),
+            Ingredient(name='сахар', measurement_unit='г'),
+        ])
+        with open(os.path.join(self.media, 'import', 'dish.png'), 'wb') as f:
+            f.write(b'image')
+
+    def make_record(self, index, **fields):
+        record = {
+            'author': 'author',
+            'name': f'рецепт {index}',
+            'text': 'описание',
+            'cooking_time': index + 1,
+            'image': 'dish.png',
+            'tags': ['breakfast', 'Обед'],
+            'ingredients': [
+                {'name': 'соль', 'measurement_unit': 'щепотка', 'amount': 1},
+                {'name': 'сахар', 'amount': index + 1},
+            ],
+        }
+        record.update(fields)
+        return json.dumps(record, ensure_ascii=False)
+
+    def write(self, lines):
+        path = os.path.join(self.directory.name, 'recipes.ndjson')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        return path
+
+    def run_import(self, *args):
+        output = StringIO()
+        errors = StringIO()
+        call_command(
+            'import_recipes',
+            *args,
+            stdout=output,
+            stderr=errors
+        )
+        return output.getvalue(), errors.getvalue()
+
+    def test_import(self):
+        """Рецепты загружаются пачками со связями, счётчиками и лентой."""
+        lines = [self.make_record(index) for index in range(5)]
+        lines[2] = self.make_record(2, tags=['dinner'])
+        lines.insert(3, '{"name": ')
+        output, errors = self.run_import(
+            self.write(lines),
+            '--batch-size',
+            '2'
+        )
+        self.assertIn('Добавлено: 4, с ошибками: 2', output)
+        self.assertIn("Строка 3: нет тега 'dinner'", errors)
+        self.assertIn('Строка 4: неверный JSON', errors)
+        self.assertEqual(Recipe.objects.count(), 4)
+        recipe = Recipe.objects.get(name='рецепт 4')
+        self.assertEqual(recipe.image.name, 'import/dish.png')
+        self.assertEqual(
+            sorted(recipe.tags.values_list('slug', flat=True)),
+            ['breakfast', 'lunch']
+        )
+        self.assertEqual(
+            sorted(RecipeIngredient.objects.filter(
+                recipe=recipe
+            ).values_list('ingredient__measurement_unit', 'amount')),
+            [('г', 5), ('щепотка', 1)]
+        )
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).recipes_count,
+            4
+        )
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.follower).count(),
+            4
+        )
+
+    def test_counters_for_bulk_created_author(self):
+        """Автору, созданному без сигналов, строка счётчиков создаётся."""
+        User.objects.bulk_create([
+            User(username='bulk', email='bulk@example.com', password='!')
+        ])
+        self.run_import(self.write([self.make_record(0, author='bulk')]))
+        self.assertEqual(
+            UserCounters.objects.get(user__username='bulk').recipes_count,
+            1
+        )
+
+    def test_images_outside_media_are_copied(self):
+        """Картинки вне MEDIA_ROOT копируются, пути наружу отклоняются."""
+        images = os.path.join(self.directory.name, 'images')
+        os.makedirs(images)
+        with open(os.path.join(images, 'photo.png'), 'wb') as file:
+            file.write(b'image')
+        lines = [
+            self.make_record(0, image='photo.png'),
+            self.make_record(1, image='../media/import/dish.png'),
+            self.make_record(2, image='missing.png'),
+        ]
+        output, errors = self.run_import(
+            self.write(lines),
+            '--images',
+            images
+        )
+        self.assertIn('Добавлено: 1, с ошибками: 2', output)
+        self.assertIn('вне каталога импорта', errors)
+        self.assertIn("нет файла 'missing.png'", errors)
+        image = Recipe.objects.get().image
+        self.assertTrue(image.name.startswith('recipes/photo'))
+        self.assertTrue(os.path.exists(image.path))
+
+    def test_ids_without_returning_backend(self):
+        """Без pk из bulk_create связи не уходят чужим рецептам."""
+        other = User.objects.create_user(username='other', password='x')
+        Recipe.objects.create(
+            author=self.author,
+            name='рецепт 0',
+            text='старый',
+            cooking_time=1,
+            image='import/dish.png'
+        )
+        bulk_create = QuerySet.bulk_create
+
+        def concurrent_bulk_create(queryset, objs, *args, **kwargs):
+            created = bulk_create(queryset, objs, *args, **kwargs)
+            if queryset.model is Recipe:
+                Recipe.objects.create(
+                    author=other,
+                    name='чужой',
+                    text='чужой',
+                    cooking_time=1,
+                    image='import/dish.png'
+                )
+                for recipe in created:
+                    recipe.pk = None
+            return created
+
+        lines = [self.make_record(index) for index in range(3)]
+        lines.append(self.make_record(1, cooking_time=9))
+        with mock.patch.object(
+            QuerySet,
+            'bulk_create',
+            concurrent_bulk_create
+        ):
+            self.run_import(self.write(lines))
+        self.assertFalse(Recipe.objects.get(name='чужой').tags.exists())
+        self.assertFalse(Recipe.objects.get(text='старый').tags.exists())
+        for recipe in Recipe.objects.filter(text='описание'):
+            self.assertEqual(recipe.tags.count(), 2)
+            self.assertEqual(
+                RecipeIngredient.objects.get(
+                    recipe=recipe,
+                    ingredient__measurement_unit='г'
+                ).amount,
+                int(recipe.name.split()[-1]) + 1
+            )
+
+    def test_images_deleted_on_failed_batch(self):
+        """Скопированные картинки удаляются, если пачка не сохранилась."""
+        images = os.path.join(self.directory.name, 'images')
+        os.makedirs(images)
+        with open(os.path.join(images, 'photo.png'), 'wb') as file:
+            file.write(b'image')
+        path = self.write([self.make_record(0, image='photo.png')])
+        with mock.patch.object(
+            RecipeImporter,
+            'save_recipes',
+            side_effect=RuntimeError('сбой')
+        ):
+            with self.assertRaises(RuntimeError):
+                self.run_import(path, '--images', images)
+        self.assertEqual(
+            os.listdir(os.path.join(self.media, 'recipes')),
+            []
+        )
+
+    def test_resume_from_checkpoint(self):
+        """После сбоя импорт продолжается с контрольной точки."""
+        path = self.write([self.make_record(index) for index in range(5)])
+        save = RecipeImporter.save
+        calls = []
+
+        def failing_save(importer, batch):
+            calls.append(len(batch))
+            if len(calls) == 2:
+                raise RuntimeError('сбой')
+            return save(importer, batch)
+
+        with mock.patch.object(RecipeImporter, 'save', failing_save):
+            with self.assertRaises(RuntimeError):
+                self.run_import(path, '--batch-size', '2')
+        self.assertEqual(Recipe.objects.count(), 2)
+        with open(f'{path}.checkpoint', encoding='utf-8') as file:
+            self.assertEqual(json.load(file), {'lines': 2})
+        output, _ = self.run_import(path, '--batch-size', '2')
+        self.assertIn('Продолжение со строки 3', output)
+        self.assertIn('Добавлено: 3', output)
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('cooking_time', flat=True)),
+            [1, 2, 3, 4, 5]
+        )
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_import_endpoint(self):
+        """Эндпоинт импорта доступен только администратору."""
+        url = '/api/recipes/import/'
+        body = '\n'.join(
+            self.make_record(index, author=None) for index in range(3)
+        )
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.post(
+            url,
+            body,
+            content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 403)
+        admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.org',
+            password='testpassword'
+        )
+        client.force_authenticate(admin)
+        response = client.post(
+            f'{url}?skip=1',
+            body,
+            content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(
+            (data['lines'], data['created'], data['failed']),
+            (3, 2, 0)
+        )
+        self.assertEqual(
+            set(Recipe.objects.values_list('author__username', flat=True)),
+            {'admin'}
+        )
+        response = client.post(
+            f'{url}?skip=x',
+            body,
+            content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.pagination import MAX_PAGE_SIZE
+from foodgram.models import Recipe, Subscription
+
+User = get_user_model()
+
+
+class CursorPaginationTests(TestCase):
+    recipes_count = 12
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword'
+        )
+        for index in range(cls.recipes_count):
+            author = User.objects.create_user(
+                username=f'author{index}',
+                password='testpassword'
+            )
+            Subscription.objects.create(user=cls.user, author=author)
+            Recipe.objects.create(
+                author=author,
+                name=f'recipe{index}',
+                text='test',
+                image='test.png',
+                cooking_time=1
+            )
+        cls.authorized_client = APIClient()
+        auth_token = Token.objects.get_or_create(user=cls.user)
+        auth_token = f'Token {str(auth_token[0])}'
+        cls.authorized_client.credentials(HTTP_AUTHORIZATION=auth_token)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.authorized_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids.extend(obj['id'] for obj in data['results'])
+            url = data['next']
+        return ids
+
+    def test_recipes_cursor_walk(self):
+        """Курсорная пагинация рецептов проходит все записи по -id."""
+        ids = self.walk('/api/recipes/?cursor=&limit=5')
+        expected = list(
+            Recipe.objects.order_by('-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_subscriptions_cursor_walk(self):
+        """Курсорная пагинация подписок проходит всех авторов."""
+        ids = self.walk('/api/users/subscriptions/?cursor=&limit=5')
+        self.assertEqual(len(ids), self.recipes_count)
+        self.assertEqual(len(set(ids)), self.recipes_count)
+
+    def test_cursor_count_is_optional(self):
+        """COUNT выполняется в режиме курсора только по запросу."""
+        for query, expected in (('', None), ('&count=1', 12)):
+            with CaptureQueriesContext(connection) as context:
+                response = self.authorized_client.get(
+                    f'/api/recipes/?cursor={query}'
+                )
+            counts = [
+                q for q in context.captured_queries
+                if 'COUNT(*)' in q['sql']
+            ]
+            with self.subTest(query=query):
+                self.assertEqual(response.json()['count'], expected)
+                self.assertEqual(len(counts), int(expected is not None))
+
+    def test_limit_upper_bound(self):
+        """Размер страницы ограничен сверху в обоих режимах."""
+        Recipe.objects.bulk_create([
+            Recipe(
+                author=self.user,
+                name='bulk',
+                text='test',
+                image='test.png',
+                cooking_time=1
+            ) for _ in range(MAX_PAGE_SIZE)
+        ])
+        for url in ('/api/recipes/?limit=1000',
+                    '/api/recipes/?cursor=&limit=1000'):
+            response = self.authorized_client.get(url)
+            with self.subTest(url=url):
+                self.assertEqual(
+                    len(response.json()['results']),
+                    MAX_PAGE_SIZE
+                )
@@ -0,0 +1,325 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.cache import token_cache
+from api.filters import RecipeFilter
+from api.shopping_list import get_shopping_list, update_cart_totals
+from foodgram.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                             ShoppingList, Subscription, Tag)
+
+User = get_user_model()
+
+
+class RecipeQueryCountTests(TestCase):
+    recipes_count = 30
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword'
+        )
+        tags = [
+            Tag.objects.create(
+                name=f'tag{index}',
+                color=f'#00000{index}',
+                slug=f'tag{index}'
+            ) for index in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient{index}',
+                measurement_unit='kg'
+            ) for index in range(3)
+        ]
+        for index in range(cls.recipes_count):
+            author = User.objects.create_user(
+                username=f'author{index}',
+                password='testpassword'
+            )
+            Subscription.objects.create(user=cls.user, author=author)
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'recipe{index}',
+                text='test',
+                image='test.png',
+                cooking_time=1
+            )
+            recipe.tags.set(tags)
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=1
+                ) for ingredient in ingredients
+            ])
+        cls.not_authorized_client = APIClient()
+        cls.authorized_client = APIClient()
+        auth_token = Token.objects.get_or_create(user=cls.user)
+        auth_token = f'Token {str(auth_token[0])}'
+        cls.authorized_client.credentials(HTTP_AUTHORIZATION=auth_token)
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+
+    def count_queries(self, client, url):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_recipe_list_query_count_does_not_depend_on_limit(self):
+        """Количество запросов к списку рецептов не зависит от limit."""
+        for client in (self.not_authorized_client, self.authorized_client):
+            cache.clear()
+            token_cache.clear()
+            small, _ = self.count_queries(client, '/api/recipes/?limit=1')
+            cache.clear()
+            token_cache.clear()
+            large, response = self.count_queries(
+                client,
+                f'/api/recipes/?limit={self.recipes_count}'
+            )
+            data = response.json()
+            with self.subTest(client=client):
+                self.assertEqual(len(data['results']), self.recipes_count)
+                self.assertEqual(small, large)
+
+    def test_recipe_list_query_budget(self):
+        """Список рецептов укладывается в фиксированный бюджет запросов."""
+        url = f'/api/recipes/?limit={self.recipes_count}'
+        with self.assertNumQueries(5):
+            self.not_authorized_client.get(url)
+        with self.assertNumQueries(2):
+            self.not_authorized_client.get(url)
+        with self.assertNumQueries(6):
+            self.authorized_client.get(url)
+        with self.assertNumQueries(2):
+            response = self.authorized_client.get(url)
+        recipe = response.json()['results'][0]
+        self.assertTrue(recipe['author']['is_subscribed'])
+        self.assertEqual(len(recipe['tags']), 3)
+        self.assertEqual(len(recipe['ingredients']), 3)
+
+    def test_recipe_detail_query_budget(self):
+        """Рецепт загружается фиксированным числом запросов."""
+        recipe = Recipe.objects.first()
+        url = f'/api/recipes/{recipe.id}/'
+        with self.assertNumQueries(4):
+            self.not_authorized_client.get(url)
+        with self.assertNumQueries(1):
+            self.not_authorized_client.get(url)
+        with self.assertNumQueries(5):
+            self.authorized_client.get(url)
+        with self.assertNumQueries(1):
+            self.authorized_client.get(url)
+
+    def test_subscriptions_query_count_does_not_depend_on_page(self):
+        """Подписки загружаются одинаковым числом запросов."""
+        small, _ = self.count_queries(
+            self.authorized_client,
+            '/api/users/subscriptions/?limit=1&recipes_limit=2'
+        )
+        token_cache.clear()
+        large, response = self.count_queries(
+            self.authorized_client,
+            '/api/users/subscriptions/?limit=30&recipes_limit=2'
+        )
+        self.assertEqual(len(response.json()['results']), 30)
+        self.assertEqual(small, large)
+
+    def test_subscriptions_recipes_limit(self):
+        """recipes_limit ограничивает число последних рецептов автора."""
+        author = User.objects.get(username='author0')
+        for index in range(3):
+            Recipe.objects.create(
+                author=author,
+                name=f'extra{index}',
+                text='test',
+                image='test.png',
+                cooking_time=1
+            )
+        url = '/api/users/subscriptions/?limit=30&recipes_limit=2'
+        _, response = self.count_queries(self.authorized_client, url)
+        recipes = {
+            subscription['id']: [recipe['name']
+                                 for recipe in subscription['recipes']]
+            for subscription in response.json()['results']
+        }
+        self.assertEqual(recipes[author.id], ['extra2', 'extra1'])
+        self.assertEqual(
+            recipes[User.objects.get(username='author1').id],
+            ['recipe1']
+        )
+        for limit in ('-1', 'abc'):
+            response = self.authorized_client.get(
+                f'/api/users/subscriptions/?recipes_limit={limit}'
+            )
+            with self.subTest(limit=limit):
+                self.assertEqual(response.status_code, 400)
+
+    def test_download_shopping_cart_query_count(self):
+        """Список покупок собирается одним запросом при любом размере."""
+        url = '/api/recipes/download_shopping_cart/'
+        recipes = list(Recipe.objects.all())
+        ShoppingList.objects.create(user=self.user, recipe=recipes[0])
+        update_cart_totals(recipes[0].id, 1, self.user.id)
+        small, _ = self.count_queries(self.authorized_client, url)
+        ShoppingList.objects.bulk_create([
+            ShoppingList(user=self.user, recipe=recipe)
+            for recipe in recipes[1:]
+        ])
+        for recipe in recipes[1:]:
+            update_cart_totals(recipe.id, 1, self.user.id)
+        token_cache.clear()
+        large, _ = self.count_queries(self.authorized_client, url)
+        self.assertEqual(small, large)
+        self.assertEqual(large, 2)
+        shopping_list = list(get_shopping_list(self.user))
+        self.assertEqual(
+            [(item['name'], item['amount']) for item in shopping_list],
+            [(f'ingredient{index}', self.recipes_count) for index in range(3)]
+        )
+
+    def test_toggle_query_budget(self):
+        """Добавление в избранное, корзину и подписка без лишних чтений."""
+        recipe = Recipe.objects.first()
+        author = User.objects.create_user(
+            username='newauthor',
+            password='testpassword'
+        )
+        cases = (
+            (f'/api/recipes/{recipe.id}/favorite/', 6),
+            (f'/api/recipes/{recipe.id}/shopping_cart/', 6),
+            (f'/api/users/{author.id}/subscribe/', 8),
+        )
+        for url, budget in cases:
+            with self.subTest(url=url):
+                token_cache.clear()
+                with self.assertNumQueries(budget):
+                    response = self.authorized_client.post(url)
+                self.assertEqual(response.status_code, 201)
+                response = self.authorized_client.post(url)
+                self.assertEqual(response.status_code, 400)
+
+
+class TagFilterTests(TestCase):
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = author = User.objects.create_user(
+            username='author',
+            password='testpassword'
+        )
+        cls.tags = [
+            Tag.objects.create(
+                name=f'tag{index}',
+                color=f'#00000{index}',
+                slug=f'tag{index}'
+            ) for index in range(3)
+        ]
+        for index in range(4):
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'recipe{index}',
+                text='test',
+                image='test.png',
+                cooking_time=1
+            )
+            recipe.tags.set(cls.tags[:index])
+
+    def setUp(self):
+        cache.clear()
+
+    def get_names(self, tags):
+        response = self.client.get('/api/recipes/', {'tags': tags})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        names = [recipe['name'] for recipe in data['results']]
+        self.assertEqual(data['count'], len(names))
+        return names
+
+    def test_recipes_with_several_tags_are_not_duplicated(self):
+        """Рецепт с несколькими подходящими тегами не дублируется."""
+        self.assertEqual(
+            self.get_names(['tag0', 'tag1', 'unknown']),
+            ['recipe3', 'recipe2', 'recipe1']
+        )
+        self.assertEqual(self.get_names(['tag2']), ['recipe3'])
+        self.assertEqual(self.get_names(['unknown']), [])
+
+    def test_filter_uses_slug_cache(self):
+        """Повторная фильтрация не запрашивает теги из базы."""
+        self.get_names(['tag0'])
+        with CaptureQueriesContext(connection) as context:
+            self.get_names(['tag1'])
+        sql = ' '.join(query['sql'] for query in context.captured_queries)
+        self.assertNotIn('foodgram_tag"', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    @skipUnless(connection.vendor == 'sqlite', 'план запроса SQLite')
+    def test_filter_plan_uses_indexes(self):
+        """Подзапрос по тегам использует индекс промежуточной таблицы."""
+        data = QueryDict(mutable=True)
+        data.setlist('tags', ['tag0', 'tag1'])
+        queryset = RecipeFilter(data, queryset=Recipe.objects.all()).qs
+        plan = queryset.explain()
+        self.assertNotIn('DISTINCT', plan)
+        self.assertIn('USING COVERING INDEX recipe_tags_tag_recipe_idx', plan)
+        self.assertNotIn('SCAN', plan)
+
+    def get_counts(self, **params):
+        response = self.client.get('/api/recipes/tag_counts/', params)
+        self.assertEqual(response.status_code, 200)
+        return {item['slug']: item['count'] for item in response.json()}
+
+    def test_tag_counts(self):
+        """Счётчики по тегам учитывают фильтры, кроме самих тегов."""
+        expected = {'tag0': 3, 'tag1': 2, 'tag2': 1}
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get_counts(tags='tag2'), expected)
+        self.assertEqual(self.get_counts(search='recipe'), expected)
+        other = User.objects.create_user(username='other', password='test')
+        self.assertEqual(
+            self.get_counts(author=other.id),
+            {'tag0': 0, 'tag1': 0, 'tag2': 0}
+        )
+        self.client.force_authenticate(other)
+        Favorite.objects.create(
+            user=other,
+            recipe=Recipe.objects.get(name='recipe1')
+        )
+        self.assertEqual(
+            self.get_counts(is_favorited=1),
+            {'tag0': 1, 'tag1': 0, 'tag2': 0}
+        )
+
+    def test_anonymous_tag_counts_are_cached(self):
+        """Счётчики для анонимных запросов берутся из кэша."""
+        self.get_counts(author=self.author.id)
+        with self.assertNumQueries(0):
+            self.get_counts(author=self.author.id, tags='tag1', page=2)
+        Recipe.objects.filter(name='recipe3').delete()
+        self.assertEqual(
+            self.get_counts(author=self.author.id),
+            {'tag0': 2, 'tag1': 1, 'tag2': 0}
+        )
+
+    def test_invalid_filter_is_rejected(self):
+        """Некорректный фильтр возвращает ошибку."""
+        response = self.client.get(
+            '/api/recipes/tag_counts/',
+            {'author': 'unknown'}
+        )
+        self.assertEqual(response.status_code, 400)
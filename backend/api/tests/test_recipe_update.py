@@ -0,0 +1,162 @@
+import re
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.cache import tag_slugs
+from foodgram.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+class RecipeUpdateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword'
+        )
+        cls.tags = [
+            Tag.objects.create(
+                name=f'tag{index}',
+                color=f'#00000{index}',
+                slug=f'tag{index}'
+            ) for index in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient{index}',
+                measurement_unit='kg'
+            ) for index in range(5)
+        ]
+        cls.recipe = Recipe.objects.create(
+            author=cls.user,
+            name='recipe',
+            text='test',
+            image='test.png',
+            cooking_time=1
+        )
+        cls.recipe.tags.set(cls.tags[:2])
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=cls.recipe,
+                ingredient=ingredient,
+                amount=index + 1
+            ) for index, ingredient in enumerate(cls.ingredients[:3])
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/recipes/{self.recipe.id}/'
+
+    def patch(self, ingredients, tags=None):
+        if tags is None:
+            tags = [tag.id for tag in self.tags[:2]]
+        return self.client.patch(
+            self.url,
+            {'tags': tags, 'ingredients': ingredients},
+            format='json'
+        )
+
+    def get_rows(self):
+        return dict(RecipeIngredient.objects.filter(
+            recipe=self.recipe
+        ).values_list('ingredient', 'id'))
+
+    def test_amounts_are_paired_by_id(self):
+        """Количество сопоставляется ингредиенту по id, а не по порядку."""
+        ingredients = [
+            {'id': ingredient.id, 'amount': amount}
+            for ingredient, amount in zip(
+                reversed(self.ingredients),
+                (10, 20, 30, 40, 50)
+            )
+        ]
+        response = self.patch(ingredients)
+        self.assertEqual(response.status_code, 200)
+        expected = {item['id']: item['amount'] for item in ingredients}
+        self.assertEqual(
+            {item['id']: item['amount']
+             for item in response.json()['ingredients']},
+            expected
+        )
+        self.assertEqual(
+            dict(RecipeIngredient.objects.filter(
+                recipe=self.recipe
+            ).values_list('ingredient', 'amount')),
+            expected
+        )
+
+    def test_update_touches_only_changed_rows(self):
+        """Изменение одного количества не перезаписывает остальные строки."""
+        before = self.get_rows()
+        ingredients = [
+            {'id': ingredient.id, 'amount': index + 1}
+            for index, ingredient in enumerate(self.ingredients[:3])
+        ]
+        ingredients[1]['amount'] = 7
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.patch(ingredients)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context.captured_queries), 15)
+        table = RecipeIngredient._meta.db_table
+        writes = [
+            query['sql'].split()[0] for query in context.captured_queries
+            if re.match(
+                f'(INSERT INTO|UPDATE|DELETE FROM) "{table}"',
+                query['sql']
+            )
+        ]
+        self.assertEqual(writes, ['UPDATE'])
+        self.assertEqual(self.get_rows(), before)
+        ingredients = ingredients[1:] + [
+            {'id': self.ingredients[4].id, 'amount': 1}
+        ]
+        response = self.patch(ingredients, [self.tags[2].id])
+        self.assertEqual(response.status_code, 200)
+        after = self.get_rows()
+        self.assertNotIn(self.ingredients[0].id, after)
+        for ingredient in self.ingredients[1:3]:
+            self.assertEqual(after[ingredient.id], before[ingredient.id])
+        self.assertIn(self.ingredients[4].id, after)
+        self.assertEqual(
+            list(self.recipe.tags.values_list('id', flat=True)),
+            [self.tags[2].id]
+        )
+
+    def test_invalid_payloads(self):
+        """Неверные теги и ингредиенты отклоняются."""
+        ingredient = self.ingredients[0].id
+        cases = (
+            ([{'id': ingredient, 'amount': 1}], [10 ** 6]),
+            ([{'id': ingredient, 'amount': 1}], ['x']),
+            ([{'id': 10 ** 6, 'amount': 1}], None),
+            ([{'id': ingredient, 'amount': 1}] * 2, None),
+            ([{'id': ingredient, 'amount': 0}], None),
+            ([{'id': ingredient, 'amount': 'x'}], None),
+            ([{'id': 'x', 'amount': 1}], None),
+            (['x'], None),
+        )
+        for ingredients, tags in cases:
+            with self.subTest(ingredients=ingredients, tags=tags):
+                response = self.patch(ingredients, tags)
+                self.assertEqual(response.status_code, 400)
+
+    def test_tags_are_checked_in_database(self):
+        """Теги проверяются по базе, а не по карте слагов процесса."""
+        ingredients = [{'id': self.ingredients[0].id, 'amount': 1}]
+        stale = {'deleted': 10 ** 6}
+        with mock.patch.object(tag_slugs, 'get_map', return_value=stale):
+            response = self.patch(ingredients, [10 ** 6])
+            self.assertEqual(response.status_code, 400)
+            response = self.patch(ingredients, [self.tags[2].id])
+            self.assertEqual(response.status_code, 200)
@@ -0,0 +1,194 @@
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.signals import register_search_functions
+from foodgram.models import Favorite, Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+class IngredientSearchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for name in ('сыр', 'сырок', 'творожный сыр', 'масло', 'Сыроежки'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+        self.client = APIClient()
+
+    def search(self, query, **params):
+        response = self.client.get(
+            '/api/ingredients/',
+            {'name': query, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.json()]
+
+    def test_prefix_matches_go_first(self):
+        """Совпадения с начала названия идут раньше совпадений внутри."""
+        self.assertEqual(
+            self.search('сыр'),
+            ['сыр', 'Сыроежки', 'сырок', 'творожный сыр']
+        )
+
+    def test_result_count_is_bounded(self):
+        """Количество результатов ограничено параметром limit."""
+        self.assertEqual(self.search('сыр', limit=2), ['сыр', 'Сыроежки'])
+
+    def test_hot_path_does_not_query_database(self):
+        """Повторный поиск не обращается к базе данных."""
+        self.search('мас')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.search('мас'), ['масло'])
+
+    def test_index_is_rebuilt_on_change(self):
+        """Индекс перестраивается после изменения ингредиентов."""
+        self.assertEqual(self.search('мас'), ['масло'])
+        Ingredient.objects.create(name='масло сливочное', measurement_unit='г')
+        self.assertEqual(self.search('мас'), ['масло', 'масло сливочное'])
+
+
+class RecipeSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='searcher',
+            password='testpassword'
+        )
+        cls.author = User.objects.create_user(
+            username='author',
+            password='testpassword'
+        )
+        cls.tag = Tag.objects.create(
+            name='обед',
+            color='#000000',
+            slug='lunch'
+        )
+        recipes = (
+            (cls.user, 'Борщ украинский', 'свёкла, капуста и говядина'),
+            (cls.author, 'Бородинский хлеб', 'ржаная мука и солод'),
+            (cls.author, 'Салат с крапивой', 'подавать к борщу'),
+            (cls.author, 'Блины', 'мука, молоко и яйца'),
+        )
+        cls.recipes = {
+            name: Recipe.objects.create(
+                author=author,
+                name=name,
+                text=text,
+                image='test.png',
+                cooking_time=1
+            ) for author, name, text in recipes
+        }
+        cls.recipes['Борщ украинский'].tags.add(cls.tag)
+        cls.recipes['Салат с крапивой'].tags.add(cls.tag)
+        Favorite.objects.create(
+            user=cls.user,
+            recipe=cls.recipes['Салат с крапивой']
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def search(self, query, **params):
+        response = self.client.get(
+            '/api/recipes/',
+            {'search': query, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_name_matches_rank_above_text_matches(self):
+        """Совпадения в названии идут раньше совпадений в описании."""
+        self.assertEqual(
+            self.search('борщ'),
+            ['Борщ украинский', 'Салат с крапивой']
+        )
+
+    def test_search_matches_text(self):
+        """Поиск находит рецепты по описанию."""
+        self.assertEqual(self.search('молоко'), ['Блины'])
+
+    def test_search_tolerates_typos_in_names(self):
+        """Поиск по названию допускает опечатки."""
+        self.assertEqual(self.search('бародинский')[0], 'Бородинский хлеб')
+
+    def test_search_combines_with_filters(self):
+        """Поиск сочетается с фильтрами по тегам, автору и избранному."""
+        self.assertEqual(
+            self.search('борщ', tags='lunch', author=self.author.id),
+            ['Салат с крапивой']
+        )
+        self.client.force_authenticate(self.user)
+        self.assertEqual(
+            self.search('борщ', is_favorited=1),
+            ['Салат с крапивой']
+        )
+
+    def test_cursor_pagination_is_rejected(self):
+        """Курсор не подменяет сортировку по релевантности."""
+        response = self.client.get(
+            '/api/recipes/',
+            {'search': 'борщ', 'cursor': ''}
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            '/api/recipes/',
+            {'search': 'борщ', 'cursor': '', 'ordering': '-id'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @skipUnless(connection.vendor == 'postgresql', 'нужен PostgreSQL')
+    def test_postgresql_trigram_search(self):
+        """На PostgreSQL опечатка находится оператором pg_trgm <%."""
+        with CaptureQueriesContext(connection) as context:
+            names = self.search('бародинский')
+        self.assertEqual(names[0], 'Бородинский хлеб')
+        self.assertTrue(any(
+            '<% ' in query['sql'] for query in context.captured_queries
+        ))
+
+    def test_search_index_follows_updates(self):
+        """Индекс поиска обновляется при изменении и удалении рецептов."""
+        recipe = self.recipes['Блины']
+        recipe.name = 'Оладьи'
+        recipe.save()
+        self.assertEqual(self.search('оладьи'), ['Оладьи'])
+        recipe.delete()
+        self.assertEqual(self.search('оладьи'), [])
+
+
+class SearchFunctionRegistrationTests(TestCase):
+
+    def register(self):
+        functions = {}
+
+        def create_function(name, num_params, func):
+            functions[name] = func
+
+        connection = SimpleNamespace(
+            vendor='sqlite',
+            connection=SimpleNamespace(create_function=create_function)
+        )
+        register_search_functions(sender=None, connection=connection)
+        return functions
+
+    def test_python_37_signature(self):
+        """На Python 3.7 функция регистрируется без deterministic."""
+        with mock.patch('api.signals.sys.version_info', (3, 7, 16)):
+            self.assertIn('trigram_coverage', self.register())
+
+    def test_current_interpreter(self):
+        """Функция регистрируется на текущей версии Python."""
+        with connection.cursor() as cursor:
+            if connection.vendor != 'sqlite':
+                self.skipTest('функция нужна только SQLite')
+            cursor.execute("SELECT trigram_coverage('сыр', 'сыр')")
+            self.assertEqual(cursor.fetchone()[0], 1.0)
@@ -0,0 +1,426 @@
+import io
+import json
+import os
+import re
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from api.cache import shopping_list_documents
+from api.pdf import render_shopping_list
+from api.shopping_list import recounting_cart_totals
+from foodgram.models import (Ingredient, Recipe, RecipeIngredient,
+                             ShoppingCartIngredient, ShoppingList, Tag)
+
+User = get_user_model()
+
+
+class ShoppingListPdfTests(SimpleTestCase):
+
+    def render(self, count):
+        ingredients = [
+            {'name': f'ingredient{index}', 'measurement_unit': 'г',
+             'amount': index}
+            for index in range(count)
+        ]
+        output = io.BytesIO()
+        render_shopping_list(output, 'Список покупок:', ingredients)
+        return output.getvalue()
+
+    def count_pages(self, content):
+        return len(re.findall(rb'/Type /Page\b(?!s)', content))
+
+    def test_long_list_is_paginated(self):
+        """Длинный список покупок переносится на следующие страницы."""
+        self.assertEqual(self.count_pages(self.render(10)), 1)
+        self.assertEqual(self.count_pages(self.render(100)), 3)
+
+
+class ShoppingListDocumentCacheTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            SHOPPING_LIST_CACHE_DIR=directory.name,
+            SHOPPING_LIST_CACHE_MAX_BYTES=10 ** 6
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.directory = directory.name
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword'
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='test',
+            measurement_unit='kg'
+        )
+        self.authorized_client = APIClient()
+        auth_token = Token.objects.get_or_create(user=self.user)
+        auth_token = f'Token {str(auth_token[0])}'
+        self.authorized_client.credentials(HTTP_AUTHORIZATION=auth_token)
+        self.url = '/api/recipes/download_shopping_cart/'
+        self.add_recipe_to_cart()
+
+    def add_recipe_to_cart(self):
+        recipe = Recipe.objects.create(
+            author=self.user,
+            name='test',
+            text='test',
+            image='test.png',
+            cooking_time=1
+        )
+        RecipeIngredient.objects.create(
+            recipe=recipe,
+            ingredient=self.ingredient,
+            amount=1
+        )
+        self.authorized_client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+
+    def download(self):
+        response = self.authorized_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def test_unchanged_cart_is_rendered_once(self):
+        """Неизменившийся список покупок повторно не формируется."""
+        with mock.patch(
+            'api.views.render_shopping_list',
+            wraps=render_shopping_list
+        ) as render:
+            self.download()
+            self.download()
+            self.assertEqual(render.call_count, 1)
+            self.add_recipe_to_cart()
+            self.download()
+            self.assertEqual(render.call_count, 2)
+
+    def test_accel_redirect(self):
+        """При настроенном префиксе файл отдаётся через X-Accel-Redirect."""
+        with override_settings(SHOPPING_LIST_ACCEL_REDIRECT='/protected/'):
+            response = self.download()
+        self.assertTrue(response['X-Accel-Redirect'].startswith('/protected/'))
+        self.assertTrue(response['X-Accel-Redirect'].endswith('.pdf'))
+
+    def test_eviction(self):
+        """Старые файлы удаляются при превышении лимита размера."""
+        self.download()
+        first = os.listdir(self.directory)
+        self.add_recipe_to_cart()
+        with override_settings(SHOPPING_LIST_CACHE_MAX_BYTES=1):
+            self.download()
+        second = os.listdir(self.directory)
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(first, second)
+
+    def test_errors_are_rendered_as_json(self):
+        """Ошибки выгрузки отдаются в JSON при любом заголовке Accept."""
+        for accept in ('application/pdf', 'text/csv', 'text/plain'):
+            with self.subTest(accept=accept):
+                response = APIClient().get(self.url, HTTP_ACCEPT=accept)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertIn('detail', response.json())
+        with mock.patch(
+            'api.views.render_shopping_list',
+            side_effect=ValidationError('test')
+        ):
+            response = self.authorized_client.get(self.url)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), ['test'])
+
+    def test_file_removed_before_touch_is_rendered_again(self):
+        """Файл, удалённый другим процессом, формируется заново."""
+        self.download()
+        with mock.patch(
+            'api.views.render_shopping_list',
+            wraps=render_shopping_list
+        ) as render, mock.patch(
+            'api.cache.os.utime',
+            side_effect=FileNotFoundError
+        ):
+            self.download()
+        self.assertEqual(render.call_count, 1)
+
+    def test_file_removed_after_put_is_served(self):
+        """Только что записанный файл отдаётся, даже если его уже удалили."""
+        def evict(keep=None):
+            os.remove(keep)
+
+        with mock.patch.object(shopping_list_documents, 'evict', evict):
+            response = self.authorized_client.get(self.url)
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.assertEqual(int(response['Content-Length']), len(content))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_stale_tmp_files_are_evicted(self):
+        """Брошенные временные файлы удаляются по возрасту."""
+        stale = os.path.join(self.directory, 'stale.pdf.1.tmp')
+        fresh = os.path.join(self.directory, 'fresh.pdf.1.tmp')
+        for path in (stale, fresh):
+            with open(path, 'wb') as document:
+                document.write(b'test')
+        past = time.time() - 2 * 60 * 60
+        os.utime(stale, (past, past))
+        self.download()
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(fresh))
+
+
+class ShoppingCartBenchmarkTests(TestCase):
+
+    def test_benchmark_renders_filled_carts(self):
+        """Замер формирует PDF по заполненной корзине во временном кэше."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        output = io.StringIO()
+        patch_render = mock.patch(
+            'api.views.render_shopping_list',
+            wraps=render_shopping_list
+        )
+        with override_settings(SHOPPING_LIST_CACHE_DIR=directory.name), \
+                patch_render as render:
+            call_command(
+                'benchmark_shopping_cart',
+                '--sizes', '3',
+                '--repeat', '1',
+                stdout=output
+            )
+        lines = [line.split('\t') for line in output.getvalue().split('\n')]
+        self.assertEqual(
+            [line[:2] for line in lines[1:3]],
+            [['render', '3'], ['cached', '3']]
+        )
+        self.assertEqual(render.call_count, 3)
+        ingredients = render.call_args[0][2]
+        self.assertEqual(len(ingredients), 12)
+        self.assertEqual(os.listdir(directory.name), [])
+
+
+class ShoppingCartTotalsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword'
+        )
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient{index}',
+                measurement_unit='kg'
+            ) for index in range(3)
+        ]
+        self.tag = Tag.objects.create(
+            name='test',
+            color='#FFFFFF',
+            slug='test'
+        )
+        self.recipes = []
+        for index in range(2):
+            recipe = Recipe.objects.create(
+                author=self.user,
+                name=f'recipe{index}',
+                text='test',
+                image='test.png',
+                cooking_time=1
+            )
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=index + 1
+                ) for ingredient in self.ingredients[index:index + 2]
+            ])
+            self.recipes.append(recipe)
+        self.authorized_client = APIClient()
+        auth_token = Token.objects.get_or_create(user=self.user)
+        auth_token = f'Token {str(auth_token[0])}'
+        self.authorized_client.credentials(HTTP_AUTHORIZATION=auth_token)
+
+    def get_cart(self):
+        response = self.authorized_client.get('/api/recipes/shopping_cart/')
+        self.assertEqual(response.status_code, 200)
+        return [(item['name'], item['amount']) for item in response.json()]
+
+    def test_totals_follow_cart(self):
+        """Сводный список обновляется при добавлении и удалении рецептов."""
+        for recipe in self.recipes:
+            self.authorized_client.post(
+                f'/api/recipes/{recipe.id}/shopping_cart/'
+            )
+        self.assertEqual(
+            self.get_cart(),
+            [('ingredient0', 1), ('ingredient1', 3), ('ingredient2', 2)]
+        )
+        self.authorized_client.delete(
+            f'/api/recipes/{self.recipes[0].id}/shopping_cart/'
+        )
+        self.assertEqual(
+            self.get_cart(),
+            [('ingredient1', 2), ('ingredient2', 2)]
+        )
+        self.recipes[1].delete()
+        self.assertEqual(self.get_cart(), [])
+        self.assertFalse(ShoppingCartIngredient.objects.exists())
+
+    def test_totals_follow_recipe_update(self):
+        """Изменение ингредиентов рецепта в корзине меняет сводный список."""
+        recipe = self.recipes[0]
+        self.authorized_client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        response = self.authorized_client.patch(
+            f'/api/recipes/{recipe.id}/',
+            {
+                'tags': [self.tag.id],
+                'ingredients': [
+                    {'id': self.ingredients[2].id, 'amount': 5}
+                ],
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_cart(), [('ingredient2', 5)])
+
+    def test_consistency_check(self):
+        """Команда проверки находит и исправляет расхождения."""
+        recipe = self.recipes[0]
+        self.authorized_client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        output = io.StringIO()
+        call_command('check_shopping_cart_totals', stdout=output)
+        self.assertIn('Расхождений: 0', output.getvalue())
+        ShoppingCartIngredient.objects.filter(user=self.user).update(amount=9)
+        output = io.StringIO()
+        call_command('check_shopping_cart_totals', '--fix', stdout=output)
+        self.assertIn('Расхождений: 2, исправлено', output.getvalue())
+        self.assertEqual(
+            self.get_cart(),
+            [('ingredient0', 1), ('ingredient1', 1)]
+        )
+
+    def assert_consistent(self):
+        output = io.StringIO()
+        call_command('check_shopping_cart_totals', stdout=output)
+        self.assertIn('Расхождений: 0', output.getvalue())
+
+    def test_totals_follow_admin(self):
+        """Правки корзины и ингредиентов в админке меняют сводный список."""
+        self.client.force_login(User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='testpassword'
+        ))
+        recipe = self.recipes[0]
+        response = self.client.post(
+            '/admin/foodgram/shoppinglist/add/',
+            {'user': self.user.id, 'recipe': recipe.id}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            self.get_cart(),
+            [('ingredient0', 1), ('ingredient1', 1)]
+        )
+        rows = list(RecipeIngredient.objects.filter(
+            recipe=recipe
+        ).order_by('id'))
+        data = {
+            'author': self.user.id,
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'favorites_count': 0,
+            'tags': [self.tag.id],
+            'recipeingredient_set-TOTAL_FORMS': len(rows),
+            'recipeingredient_set-INITIAL_FORMS': len(rows),
+            'recipeingredient_set-MIN_NUM_FORMS': 0,
+            'recipeingredient_set-MAX_NUM_FORMS': 1000,
+        }
+        for index, row in enumerate(rows):
+            prefix = f'recipeingredient_set-{index}-'
+            data.update({
+                f'{prefix}id': row.id,
+                f'{prefix}recipe': recipe.id,
+                f'{prefix}ingredient': row.ingredient_id,
+                f'{prefix}amount': 4,
+            })
+        data['recipeingredient_set-0-DELETE'] = 'on'
+        response = self.client.post(
+            f'/admin/foodgram/recipe/{recipe.id}/change/',
+            data
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get_cart(), [('ingredient1', 4)])
+        self.client.post(
+            f'/admin/foodgram/recipeingredient/{rows[1].id}/change/',
+            {
+                'recipe': recipe.id,
+                'ingredient': self.ingredients[2].id,
+                'amount': 6,
+            }
+        )
+        self.assertEqual(self.get_cart(), [('ingredient2', 6)])
+        self.assert_consistent()
+        cart = ShoppingList.objects.get(user=self.user)
+        response = self.client.post(
+            f'/admin/foodgram/shoppinglist/{cart.id}/delete/',
+            {'post': 'yes'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get_cart(), [])
+        self.assert_consistent()
+
+    def test_queryset_update_inside_recount(self):
+        """Массовое update() внутри recounting_cart_totals не ломает итоги."""
+        recipe = self.recipes[0]
+        self.authorized_client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        with recounting_cart_totals([recipe.id]):
+            RecipeIngredient.objects.filter(recipe=recipe).update(amount=7)
+        self.assertEqual(
+            self.get_cart(),
+            [('ingredient0', 7), ('ingredient1', 7)]
+        )
+        self.assert_consistent()
+
+    def test_export_formats(self):
+        """Список покупок выгружается в txt, csv и json потоково."""
+        recipe = self.recipes[0]
+        self.authorized_client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        url = '/api/recipes/download_shopping_cart/'
+        expected = {
+            'txt': '> ingredient0(kg) — 1\n> ingredient1(kg) — 1\n',
+            'csv': ('name,measurement_unit,amount\r\n'
+                    'ingredient0,kg,1\r\ningredient1,kg,1\r\n'),
+        }
+        for export_format, content in expected.items():
+            response = self.authorized_client.get(
+                url,
+                {'format': export_format}
+            )
+            with self.subTest(export_format=export_format):
+                self.assertTrue(response.streaming)
+                self.assertTrue(
+                    b''.join(response.streaming_content).decode().endswith(
+                        content
+                    )
+                )
+        response = self.authorized_client.get(url, {'format': 'json'})
+        self.assertEqual(
+            json.loads(b''.join(response.streaming_content)),
+            [
+                {'id': self.ingredients[0].id, 'name': 'ingredient0',
+                 'measurement_unit': 'kg', 'amount': 1},
+                {'id': self.ingredients[1].id, 'name': 'ingredient1',
+                 'measurement_unit': 'kg', 'amount': 1},
+            ]
+        )
+        response = self.authorized_client.get(url, {'format': 'xml'})
+        self.assertEqual(response.status_code, 404)
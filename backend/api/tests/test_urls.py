@@ -63,6 +63,7 @@ class URLAccessTests(TestCase):
         test_urls = [
             '/api/users/me/',
             '/api/recipes/download_shopping_cart/',
+            '/api/recipes/shopping_cart/',
             '/api/users/subscriptions/'
         ]
         for url in test_urls:
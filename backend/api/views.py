@@ -1,61 +1,108 @@
-import io
-
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from django.db.models import Count, Exists, OuterRef
-from django.http import FileResponse
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotAuthenticated, ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.viewsets import (GenericViewSet, ModelViewSet,
                                      ReadOnlyModelViewSet)
 
-from foodgram.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                             ShoppingList, Subscription, Tag)
+from foodgram.models import (Favorite, Ingredient, Recipe, ShoppingList,
+                             Subscription, Tag)
 
-from .filters import NameSearchFilter, RecipeFilter
-from .pagination import CustomPagination
+from .bulk import (add_recipes, add_subscriptions, remove_recipes,
+                   remove_subscriptions)
+from .cache import (recipe_cache, shopping_list_documents, tag_count_cache,
+                    tag_slugs)
+from .counters import FAVORITES_VERSION, get_favorites_version_name
+from .feed import get_feed, get_feed_cursor
+from .filters import NameSearchFilter, RecipeFilter, StableOrderingFilter
+from .mixins import ConditionalGetMixin, RenderedListCacheMixin
+from .pagination import OptionalCursorPagination
+from .parsers import NDJSONParser
+from .pdf import RENDERER_VERSION, render_shopping_list
 from .permissions import IsAuthorOrReadOnlyPermission
-from .serializers import (IngredientSerializer, RecipeSerializer,
+from .recipe_import import RecipeImporter, get_import_skip
+from .renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
+from .serializers import (BulkIdsSerializer, IngredientSerializer,
+                          RecipeSerializer, ShoppingCartIngredientSerializer,
                           ShortRecipeSerializer, SubscribeSerializer,
                           TagSerializer)
+from .shopping_list import (EXPORT_FORMATS, get_shopping_list,
+                            update_cart_totals)
+from .subscriptions import get_latest_recipes, get_recipes_limit
 
 User = get_user_model()
 
+IMPORT_MAX_ERRORS = 100
+
+
+def get_bulk_ids(request):
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['ids']
+
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, RenderedListCacheMixin,
+                 ReadOnlyModelViewSet):
+    version_names = ('tags',)
     pagination_class = None
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
 
-class RecipeViewSet(ModelViewSet):
-    queryset = Recipe.objects.prefetch_related('ingredients')
+class RecipeViewSet(ConditionalGetMixin, ModelViewSet):
+    version_names = ('recipes',)
+    user_dependent = True
+    queryset = Recipe.objects.order_by('-id')
     serializer_class = RecipeSerializer
     filter_class = RecipeFilter
+    filter_backends = (DjangoFilterBackend, StableOrderingFilter)
+    ordering_fields = ('id', 'favorites_count')
+    pagination_class = OptionalCursorPagination
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,
                           IsAuthorOrReadOnlyPermission)
 
-    def get_queryset(self):
-        user = self.request.user
-        if user.is_anonymous:
-            return self.queryset.order_by('-id')
-        return self.queryset.annotate(
-            is_favorited=Exists(Favorite.objects.filter(
-                recipe__pk=OuterRef('pk'),
-                user=user
-            ))
-        ).annotate(
-            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
-                recipe__pk=OuterRef('pk'),
-                user=user
-            ))
-        ).order_by('-id')
+    def get_version_names(self, request):
+        """
+        Счётчик избранного меняется без сброса версии 'recipes':
+        страница рецепта зависит только от его собственной версии,
+        списки — от общей версии избранного.
+        """
+        names = super().get_version_names(request)
+        pk = str(self.kwargs.get('pk', ''))
+        if self.action == 'retrieve' and pk.isdigit():
+            names.append(get_favorites_version_name(int(pk)))
+        else:
+            names.append(FAVORITES_VERSION)
+        return names
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """
+        Ошибки выгрузки списка покупок отдаются в JSON, а не рендерерами
+        PDF, CSV и текста, выбранными по заголовку Accept.
+        """
+        response = super().finalize_response(
+            request,
+            response,
+            *args,
+            **kwargs
+        )
+        if (getattr(self, 'action', None) == 'download_shopping_cart'
+                and isinstance(response, Response)
+                and response.status_code >= 400):
+            response.accepted_renderer = JSONRenderer()
+            response.accepted_media_type = JSONRenderer.media_type
+        return response
 
     @action(detail=True, methods=['post', 'delete'], name='favorite')
     def favorite(self, request, pk):
@@ -69,77 +116,211 @@ class RecipeViewSet(ModelViewSet):
             return self.add_obj(ShoppingList, request, pk)
         return self.del_obj(ShoppingList, request, pk)
 
-    @action(detail=False, name='download_shopping_cart')
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='favorite/bulk',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_bulk(self, request):
+        return self.bulk_obj(Favorite, request)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='shopping_cart/bulk',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_bulk(self, request):
+        return self.bulk_obj(ShoppingList, request)
+
+    @action(
+        detail=False,
+        url_path='shopping_cart',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_contents(self, request):
+        serializer = ShoppingCartIngredientSerializer(
+            get_shopping_list(request.user),
+            many=True
+        )
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        name='download_shopping_cart',
+        renderer_classes=(PDFRenderer, PlainTextRenderer, CSVRenderer,
+                          JSONRenderer)
+    )
     def download_shopping_cart(self, request):
         user = request.user
         if user.is_anonymous:
-            return Response(status=status.HTTP_401_UNAUTHORIZED)
-
-        buf = io.BytesIO()
-        p = canvas.Canvas(buf, pagesize=A4)
-        pdfmetrics.registerFont(TTFont('font', 'fonts/arial.ttf'))
-        p.setFont("font", 20)
-        p.drawString(50, 780,
-                     f'Список покупок пользователя {user.first_name}:')
-        p.setFont("font", 14)
-        shopping_list = ShoppingList.objects.filter(user=user)
-        ingredients = dict()
-        for ind, shopping_list_recipe in enumerate(shopping_list):
-            recipe_ingredients = RecipeIngredient.objects.filter(
-                recipe=shopping_list_recipe.recipe
+            raise NotAuthenticated
+
+        title = f'Список покупок пользователя {user.first_name}:'
+        export_format = request.accepted_renderer.format
+        if export_format in EXPORT_FORMATS:
+            content_type, stream = EXPORT_FORMATS[export_format]
+            response = StreamingHttpResponse(
+                stream(title, get_shopping_list(user).iterator()),
+                content_type=content_type
             )
-            for ingredient in recipe_ingredients:
-                ing_obj = ingredient.ingredient
-                amount = ingredient.amount
-                ingredients[ing_obj] = ingredients.get(ing_obj, 0) + amount
-        for ind, (ingredient, amount) in enumerate(ingredients.items()):
-            line = f'> {ingredient}({ingredient.measurement_unit}) — {amount}'
-            p.drawString(65, 750 - 20 * ind, line)
-        p.showPage()
-        p.save()
-        buf.seek(0)
-        return FileResponse(
-            buf,
-            as_attachment=True,
-            filename='shopping_cart.pdf'
+            response['Content-Disposition'] = (
+                f'attachment; filename="shopping_cart.{export_format}"'
+            )
+            return response
+        ingredients = list(get_shopping_list(user))
+        key = shopping_list_documents.make_key(
+            RENDERER_VERSION,
+            title,
+            [(ingredient['name'], ingredient['measurement_unit'],
+              ingredient['amount']) for ingredient in ingredients]
+        )
+        document = shopping_list_documents.open(key, 'pdf')
+        if document is None:
+            document = shopping_list_documents.put(
+                key,
+                'pdf',
+                lambda output: render_shopping_list(
+                    output,
+                    title,
+                    ingredients
+                )
+            )
+        return shopping_list_documents.response(
+            document,
+            key,
+            'pdf',
+            'shopping_cart.pdf',
+            'application/pdf'
         )
 
-    def add_obj(self, model, request, pk):
-        if not model.objects.filter(user=request.user, recipe=pk).exists():
-            obj = model.objects.create(
-                user=request.user,
-                recipe=get_object_or_404(Recipe, id=pk)
+    @action(detail=False)
+    def tag_counts(self, request):
+        params = {
+            name: sorted(request.query_params.getlist(name))
+            for name in self.filter_class.base_filters
+            if name != 'tags' and name in request.query_params
+        }
+        key = None
+        if request.user.is_anonymous:
+            key = tag_count_cache.make_key(params)
+            counts = tag_count_cache.get(key)
+            if counts is not None:
+                return Response(counts)
+        data = request.query_params.copy()
+        data.pop('tags', None)
+        filterset = self.filter_class(
+            data,
+            queryset=Recipe.objects.all(),
+            request=request
+        )
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        found = dict(filterset.qs.filter(
+            tags__isnull=False
+        ).values_list('tags').annotate(count=Count('id')).order_by())
+        counts = [
+            {'id': tag_id, 'slug': slug, 'count': found.get(tag_id, 0)}
+            for slug, tag_id in sorted(tag_slugs.get_map().items())
+        ]
+        if key is not None:
+            tag_count_cache.set(key, counts)
+        return Response(counts)
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        before = get_feed_cursor(request)
+        limit = self.paginator.get_page_size(request)
+        ids = get_feed(request.user, limit, before)
+        serializer = self.get_serializer(
+            Recipe.objects.filter(id__in=ids).order_by('-id'),
+            many=True
+        )
+        next_link = None
+        if len(ids) == limit:
+            next_link = replace_query_param(
+                request.build_absolute_uri(),
+                'before',
+                ids[-1]
             )
-            serializer = ShortRecipeSerializer(obj.recipe)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        return Response({'next': next_link, 'results': serializer.data})
+
+    @action(
+        detail=False,
+        methods=('post',),
+        url_path='import',
+        parser_classes=(NDJSONParser,),
+        permission_classes=(permissions.IsAdminUser,)
+    )
+    def import_recipes(self, request):
+        skip = get_import_skip(request)
+        importer = RecipeImporter(
+            settings.RECIPE_IMPORT_ROOT,
+            default_author=request.user
+        )
+        stats = importer.run(request.data, skip=skip)
+        return Response(
+            stats.as_dict(max_errors=IMPORT_MAX_ERRORS),
+            status=(status.HTTP_201_CREATED if stats.created
+                    else status.HTTP_200_OK)
+        )
+
+    @action(detail=False, permission_classes=(permissions.IsAdminUser,))
+    def cache_stats(self, request):
+        return Response(recipe_cache.stats())
+
+    def add_obj(self, model, request, pk):
+        recipe = get_object_or_404(Recipe, id=pk)
+        try:
+            with transaction.atomic():
+                model.objects.create(user=request.user, recipe=recipe)
+                if model is ShoppingList:
+                    update_cart_totals(recipe.id, 1, request.user.id)
+        except IntegrityError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        serializer = ShortRecipeSerializer(recipe)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def bulk_obj(self, model, request):
+        ids = get_bulk_ids(request)
+        if request.method == 'POST':
+            return Response(add_recipes(model, request.user, ids))
+        return Response(remove_recipes(model, request.user, ids))
 
     def del_obj(self, model, request, pk):
-        model.objects.filter(
-            user=request.user,
-            recipe=pk
-        ).delete()
+        with transaction.atomic():
+            deleted, _ = model.objects.filter(
+                user=request.user,
+                recipe=pk
+            ).delete()
+            if deleted and model is ShoppingList:
+                update_cart_totals(pk, -1, request.user.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, RenderedListCacheMixin,
+                        ReadOnlyModelViewSet):
+    version_names = ('ingredients',)
     pagination_class = None
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (NameSearchFilter,)
-    search_fields = ('name',)
 
 
 class SubscriptionViewSet(GenericViewSet):
     serializer_class = SubscribeSerializer
     permission_classes = (IsAuthenticated,)
+    filter_backends = (StableOrderingFilter,)
+    ordering_fields = ('id', 'recipes_count', 'followers_count')
 
     def get_queryset(self):
         user = self.request.user
         return Subscription.objects.filter(
             user=user
         ).prefetch_related('author').annotate(
-            recipes_count=Count('author__recipe')
+            recipes_count=Coalesce('author__counters__recipes_count', 0),
+            followers_count=Coalesce('author__counters__followers_count', 0)
         ).annotate(
             is_subscribed=Exists(Subscription.objects.filter(
                 user=user,
@@ -149,44 +330,70 @@ class SubscriptionViewSet(GenericViewSet):
 
     @action(detail=True, methods=('post', 'delete'))
     def subscribe(self, request, pk=None):
-        author = get_object_or_404(User, id=pk)
         user = request.user
-        subscription = Subscription.objects.filter(user=user, author=author)
+        if request.method == 'DELETE':
+            author = get_object_or_404(User, id=pk)
+            Subscription.objects.filter(user=user, author=author).delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        limit = get_recipes_limit(request)
+        author = get_object_or_404(
+            User.objects.select_related('counters'),
+            id=pk
+        )
+        if user == author:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        try:
+            with transaction.atomic():
+                subscribe = Subscription.objects.create(
+                    user=user,
+                    author=author
+                )
+        except IntegrityError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        counters = getattr(author, 'counters', None)
+        serializer = SubscribeSerializer(
+            subscribe,
+            context={
+                'request': request,
+                'is_subscribed': True,
+                'recipes_count': counters.recipes_count if counters else 0,
+                'followers_count': (
+                    counters.followers_count + 1 if counters else 0
+                ),
+                'recipes': get_latest_recipes([author.id], limit)
+            }
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='subscribe/bulk'
+    )
+    def subscribe_bulk(self, request):
+        ids = get_bulk_ids(request)
         if request.method == 'POST':
-            if user == author or subscription.exists():
-                return Response(status=status.HTTP_400_BAD_REQUEST)
-            subscribe = Subscription.objects.create(
-                user=user,
-                author=author
-            )
-            recipes_count = Recipe.objects.filter(author=author).count()
-            is_subscribed = Subscription.objects.filter(
-                user=user,
-                author=author
-            ).exists()
-            serializer = SubscribeSerializer(
-                subscribe,
-                context={
-                    'request': request,
-                    'is_subscribed': is_subscribed,
-                    'recipes_count': recipes_count
-                }
-            )
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        subscription.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+            return Response(add_subscriptions(request.user, ids))
+        return Response(remove_subscriptions(request.user, ids))
 
     @action(detail=False)
     def subscriptions(self, request):
-        subscriptions = self.get_queryset()
-        paginator = CustomPagination()
+        limit = get_recipes_limit(request)
+        subscriptions = self.filter_queryset(self.get_queryset())
+        paginator = OptionalCursorPagination()
         paginated_subscriptions = paginator.paginate_queryset(
             subscriptions,
-            request
+            request,
+            view=self
+        )
+        recipes = get_latest_recipes(
+            [subscription.author_id
+             for subscription in paginated_subscriptions],
+            limit
         )
         serializer = SubscribeSerializer(
             paginated_subscriptions,
-            context={'request': request},
+            context={'request': request, 'recipes': recipes},
             many=True
         )
         return Response(
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -83,6 +84,26 @@ else:
         }
     }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Тестовая база в памяти не допускает параллельных соединений,
+    # и тесты конкурентных запросов на ней пропускались бы.
+    DATABASES['default']['TEST'] = {
+        'NAME': os.getenv(
+            'DB_TEST_NAME',
+            os.path.join(tempfile.gettempdir(), 'foodgram_test.sqlite3')
+        )
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -104,7 +125,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.CustomPagination',
     'PAGE_SIZE': 5,
@@ -142,3 +163,29 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+SHOPPING_LIST_CACHE_DIR = os.getenv(
+    'SHOPPING_LIST_CACHE_DIR',
+    os.path.join(BASE_DIR, 'shopping_lists')
+)
+SHOPPING_LIST_CACHE_MAX_BYTES = int(
+    os.getenv('SHOPPING_LIST_CACHE_MAX_BYTES', 100 * 1024 * 1024)
+)
+SHOPPING_LIST_CACHE_TMP_MAX_AGE = int(
+    os.getenv('SHOPPING_LIST_CACHE_TMP_MAX_AGE', 60 * 60)
+)
+SHOPPING_LIST_ACCEL_REDIRECT = os.getenv('SHOPPING_LIST_ACCEL_REDIRECT', '')
+
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('FEED_FANOUT_MAX_FOLLOWERS', 10000))
+FEED_FANOUT_RESUME_FOLLOWERS = int(os.getenv(
+    'FEED_FANOUT_RESUME_FOLLOWERS',
+    FEED_FANOUT_MAX_FOLLOWERS * 9 // 10
+))
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', 100))
+FEED_MAX_SIZE = int(os.getenv('FEED_MAX_SIZE', 1000))
+
+RECIPE_IMPORT_ROOT = os.getenv('RECIPE_IMPORT_ROOT', MEDIA_ROOT)
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 60))
+TOKEN_CACHE_ALIAS = os.getenv('TOKEN_CACHE_ALIAS', 'default')
@@ -1,8 +1,14 @@
 from django.contrib import admin
 from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from api.search import search_recipes
+from api.shopping_list import (recounting_cart_totals, subtract_cart_rows,
+                               update_cart_totals)
 
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingList, Subscription, Tag)
+                     ShoppingCartIngredient, ShoppingList, Subscription, Tag,
+                     UserCounters)
 
 User = get_user_model()
 
@@ -26,6 +32,24 @@ class IngredientInline(admin.TabularInline):
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
 
+    def save_model(self, request, obj, form, change):
+        recipe_ids = {obj.recipe_id}
+        if change:
+            recipe_ids.update(RecipeIngredient.objects.filter(
+                pk=obj.pk
+            ).values_list('recipe_id', flat=True))
+        with recounting_cart_totals(recipe_ids):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with recounting_cart_totals([obj.recipe_id]):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        with recounting_cart_totals(recipe_ids):
+            super().delete_queryset(request, queryset)
+
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
@@ -42,10 +66,21 @@ class RecipeAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
     inlines = (IngredientInline,)
 
+    def save_related(self, request, form, formsets, change):
+        with recounting_cart_totals([form.instance.pk]):
+            super().save_related(request, form, formsets, change)
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return search_recipes(queryset, search_term), False
+
     def view_favorite(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
 
     view_favorite.short_description = 'избранные'
+    view_favorite.admin_order_field = 'favorites_count'
 
 
 @admin.register(Favorite)
@@ -61,3 +96,34 @@ class SubscriptionAdmin(admin.ModelAdmin):
 @admin.register(ShoppingList)
 class ShoppingListAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            if change:
+                subtract_cart_rows(ShoppingList.objects.filter(
+                    pk=obj.pk
+                ).values_list('user_id', 'recipe_id'))
+            super().save_model(request, obj, form, change)
+            update_cart_totals(obj.recipe_id, 1, obj.user_id)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            update_cart_totals(obj.recipe_id, -1, obj.user_id)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            rows = list(queryset.values_list('user_id', 'recipe_id'))
+            super().delete_queryset(request, queryset)
+            subtract_cart_rows(rows)
+
+
+@admin.register(ShoppingCartIngredient)
+class ShoppingCartIngredientAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount', 'recipes_count')
+
+
+@admin.register(UserCounters)
+class UserCountersAdmin(admin.ModelAdmin):
+    list_display = ('user', 'recipes_count', 'followers_count',
+                    'feed_paused')
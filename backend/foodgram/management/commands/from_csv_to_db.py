@@ -1,17 +1,15 @@
-import csv
+from .import_ingredients import Command as ImportIngredientsCommand
 
-from django.core.management.base import BaseCommand
 
-from foodgram.models import Ingredient
+class Command(ImportIngredientsCommand):
+    help = ('Прежнее имя команды import_ingredients, оставлено '
+            'для существующих скриптов развёртывания.')
 
-
-class Command(BaseCommand):
-    def handle(self, *args, **kwargs):
-        with open('foodgram/data/ingredients.csv', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            for row in reader:
-                name, measurement_unit = row
-                Ingredient.objects.get_or_create(
-                    name=name,
-                    measurement_unit=measurement_unit
-                )
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--no-input',
+            '--noinput',
+            action='store_true',
+            help='Не используется: команда ничего не спрашивает.'
+        )
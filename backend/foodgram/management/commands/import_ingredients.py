@@ -0,0 +1,156 @@
+import csv
+import io
+import json
+import os
+import re
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.cache import data_versions
+from foodgram.models import Ingredient
+
+DEFAULT_PATH = os.path.join(settings.BASE_DIR, 'foodgram', 'data',
+                            'ingredients.csv')
+CSV_HEADER = ('name', 'measurement_unit')
+CHUNK_SIZE = 64 * 1024
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if not row or tuple(row) == CSV_HEADER:
+            continue
+        if len(row) != 2:
+            raise CommandError(f'Ожидались два столбца, получено: {row}')
+        yield row[0], row[1]
+
+
+def is_truncated(buffer, error):
+    """Ошибка у конца буфера означает недочитанный, а не испорченный JSON."""
+    return (error.msg.startswith('Unterminated')
+            or not buffer[error.pos:].strip())
+
+
+def get_json_row(item, index):
+    if not isinstance(item, dict) or not all(
+        isinstance(item.get(key), str) for key in CSV_HEADER
+    ):
+        raise CommandError(
+            f'Элемент {index}: ожидался объект со строковыми полями '
+            f'{", ".join(CSV_HEADER)}.'
+        )
+    return item['name'], item['measurement_unit']
+
+
+def iter_json(file):
+    """
+    Разбирает массив объектов JSON по частям, не загружая файл целиком.
+
+    Граница части может прийтись на любое место элемента, например
+    внутрь escape-последовательности \\uXXXX, поэтому при ошибке разбора
+    дочитывается следующая часть, а ошибка выдаётся только в конце файла.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидался массив JSON.')
+    position = 1
+    index = 0
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as error:
+            chunk = file.read(CHUNK_SIZE)
+            if chunk:
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            if is_truncated(buffer, error):
+                raise CommandError(
+                    f'Файл JSON обрывается на элементе {index}.'
+                )
+            raise CommandError(
+                f'Элемент {index}: неверный JSON: {error.msg}.'
+            )
+        yield get_json_row(item, index)
+        index += 1
+
+
+READERS = {
+    'csv': iter_csv,
+    'json': iter_json,
+}
+
+
+class Command(BaseCommand):
+    help = ('Загружает ингредиенты из CSV или JSON. Повторная загрузка '
+            'не создаёт дубликатов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=DEFAULT_PATH,
+            help='Путь к файлу или «-» для чтения из stdin.'
+        )
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла; по умолчанию определяется по расширению.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def get_format(self, path, file_format):
+        if file_format:
+            return file_format
+        extension = os.path.splitext(path)[1].lstrip('.').lower()
+        if extension not in READERS:
+            return 'csv'
+        return extension
+
+    def open(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        try:
+            return open(path, encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(error)
+
+    def import_rows(self, rows, batch_size):
+        seen = set()
+        batch = []
+        total = 0
+        for name, measurement_unit in rows:
+            total += 1
+            key = (name.strip(), measurement_unit.strip())
+            if not all(key) or key in seen:
+                continue
+            seen.add(key)
+            batch.append(Ingredient(name=key[0], measurement_unit=key[1]))
+            if len(batch) >= batch_size:
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        return total
+
+    def handle(self, *args, **options):
+        read = READERS[self.get_format(options['path'], options['format'])]
+        start = time.perf_counter()
+        with self.open(options['path']) as file, transaction.atomic():
+            before = Ingredient.objects.count()
+            total = self.import_rows(read(file), options['batch_size'])
+            inserted = Ingredient.objects.count() - before
+        elapsed = time.perf_counter() - start
+        if inserted:
+            data_versions.bump('ingredients')
+        self.stdout.write(
+            f'Добавлено: {inserted}, пропущено: {total - inserted}, '
+            f'{total / elapsed if elapsed else 0:.0f} строк/с'
+        )
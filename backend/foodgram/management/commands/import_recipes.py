@@ -0,0 +1,107 @@
+import io
+import json
+import os
+import sys
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.recipe_import import RecipeImporter
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Загружает рецепты из NDJSON пачками. После каждой пачки '
+            'записывает контрольную точку, с которой продолжает '
+            'повторный запуск.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Путь к файлу или «-» для чтения из stdin.'
+        )
+        parser.add_argument(
+            '--images',
+            default=settings.RECIPE_IMPORT_ROOT,
+            help='Каталог, относительно которого заданы пути картинок.'
+        )
+        parser.add_argument(
+            '--author',
+            help='Автор для рецептов без поля author.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки; по умолчанию <path>.checkpoint.'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать с начала, не читая контрольную точку.'
+        )
+
+    def open(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        try:
+            return open(path, encoding='utf-8')
+        except OSError as error:
+            raise CommandError(error)
+
+    def get_author(self, username):
+        if username is None:
+            return None
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {username}.')
+
+    def read_checkpoint(self, path):
+        if path is None or not os.path.exists(path):
+            return 0
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)['lines']
+
+    def write_checkpoint(self, path, stats):
+        if path is not None:
+            with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+                json.dump({'lines': stats.lines}, file)
+            os.replace(f'{path}.tmp', path)
+        self.stdout.write(
+            f'Строк: {stats.lines}, рецептов: {stats.created}, '
+            f'{stats.rate:.0f} рецептов/с'
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        if checkpoint is None and options['path'] != '-':
+            checkpoint = f'{options["path"]}.checkpoint'
+        skip = 0
+        if not options['restart']:
+            skip = self.read_checkpoint(checkpoint)
+        if skip:
+            self.stdout.write(f'Продолжение со строки {skip + 1}')
+        importer = RecipeImporter(
+            options['images'],
+            default_author=self.get_author(options['author']),
+            batch_size=options['batch_size']
+        )
+        with self.open(options['path']) as file:
+            stats = importer.run(
+                file,
+                skip=skip,
+                on_batch=lambda stats: self.write_checkpoint(
+                    checkpoint,
+                    stats
+                )
+            )
+        for line, message in stats.errors:
+            self.stderr.write(f'Строка {line}: {message}')
+        if checkpoint is not None and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(
+            f'Добавлено: {stats.created}, с ошибками: {len(stats.errors)}, '
+            f'{stats.rate:.0f} рецептов/с'
+        )
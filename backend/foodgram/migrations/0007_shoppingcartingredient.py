@@ -0,0 +1,58 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, F, Sum
+
+
+def fill_shopping_cart_totals(apps, schema_editor):
+    RecipeIngredient = apps.get_model('foodgram', 'RecipeIngredient')
+    ShoppingCartIngredient = apps.get_model(
+        'foodgram', 'ShoppingCartIngredient'
+    )
+    totals = RecipeIngredient.objects.values(
+        'ingredient',
+        user=F('recipe__shopping_cart__user')
+    ).filter(
+        user__isnull=False
+    ).annotate(
+        amount=Sum('amount'),
+        recipes_count=Count('recipe')
+    ).order_by()
+    ShoppingCartIngredient.objects.bulk_create([
+        ShoppingCartIngredient(
+            user_id=row['user'],
+            ingredient_id=row['ingredient'],
+            amount=row['amount'] or 0,
+            recipes_count=row['recipes_count']
+        ) for row in totals.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('foodgram', '0006_auto_20221224_0204'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartIngredient',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(default=0, verbose_name='количество')),
+                ('recipes_count', models.IntegerField(default=0, verbose_name='количество рецептов')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_totals', to='foodgram.Ingredient', verbose_name='ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+            ],
+            options={
+                'unique_together': {('user', 'ingredient')},
+            },
+        ),
+        migrations.RunPython(
+            fill_shopping_cart_totals,
+            migrations.RunPython.noop
+        ),
+    ]
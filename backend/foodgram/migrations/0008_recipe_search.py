@@ -0,0 +1,75 @@
+import sqlite3
+
+from django.db import migrations
+
+POSTGRESQL_FORWARD = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    "CREATE INDEX IF NOT EXISTS foodgram_recipe_search_idx "
+    "ON foodgram_recipe USING GIN "
+    "(to_tsvector('russian', name || ' ' || text))",
+    'CREATE INDEX IF NOT EXISTS foodgram_recipe_name_trgm_idx '
+    'ON foodgram_recipe USING GIN (name gin_trgm_ops)',
+)
+POSTGRESQL_BACKWARD = (
+    'DROP INDEX IF EXISTS foodgram_recipe_name_trgm_idx',
+    'DROP INDEX IF EXISTS foodgram_recipe_search_idx',
+)
+SQLITE_FORWARD = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS foodgram_recipe_search "
+    "USING fts5(name, text, content='foodgram_recipe', "
+    "content_rowid='id', tokenize='trigram')",
+    'CREATE TRIGGER IF NOT EXISTS foodgram_recipe_search_insert '
+    'AFTER INSERT ON foodgram_recipe BEGIN '
+    'INSERT INTO foodgram_recipe_search (rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    'CREATE TRIGGER IF NOT EXISTS foodgram_recipe_search_delete '
+    'AFTER DELETE ON foodgram_recipe BEGIN '
+    'INSERT INTO foodgram_recipe_search '
+    '(foodgram_recipe_search, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); END",
+    'CREATE TRIGGER IF NOT EXISTS foodgram_recipe_search_update '
+    'AFTER UPDATE OF name, text ON foodgram_recipe BEGIN '
+    'INSERT INTO foodgram_recipe_search '
+    '(foodgram_recipe_search, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); "
+    'INSERT INTO foodgram_recipe_search (rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    'INSERT INTO foodgram_recipe_search (foodgram_recipe_search) '
+    "VALUES ('rebuild')",
+)
+SQLITE_BACKWARD = (
+    'DROP TRIGGER IF EXISTS foodgram_recipe_search_update',
+    'DROP TRIGGER IF EXISTS foodgram_recipe_search_delete',
+    'DROP TRIGGER IF EXISTS foodgram_recipe_search_insert',
+    'DROP TABLE IF EXISTS foodgram_recipe_search',
+)
+
+
+def get_statements(connection, forward):
+    if connection.vendor == 'postgresql':
+        return POSTGRESQL_FORWARD if forward else POSTGRESQL_BACKWARD
+    if (connection.vendor == 'sqlite'
+            and sqlite3.sqlite_version_info >= (3, 34, 0)):
+        return SQLITE_FORWARD if forward else SQLITE_BACKWARD
+    return ()
+
+
+def create_search_index(apps, schema_editor):
+    for statement in get_statements(schema_editor.connection, True):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    for statement in get_statements(schema_editor.connection, False):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0007_shoppingcartingredient'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
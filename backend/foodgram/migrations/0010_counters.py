@@ -0,0 +1,68 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:23
+
+from importlib import import_module
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+recipe_search = import_module('foodgram.migrations.0008_recipe_search')
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Recipe = apps.get_model('foodgram', 'Recipe')
+    Favorite = apps.get_model('foodgram', 'Favorite')
+    Subscription = apps.get_model('foodgram', 'Subscription')
+    UserCounters = apps.get_model('foodgram', 'UserCounters')
+    Recipe.objects.update(favorites_count=Coalesce(Subquery(
+        Favorite.objects.filter(
+            recipe=OuterRef('pk')
+        ).values('recipe').annotate(count=Count('id')).values('count')
+    ), 0))
+    recipes = dict(Recipe.objects.values('author').annotate(
+        count=Count('id')
+    ).order_by().values_list('author', 'count'))
+    followers = dict(Subscription.objects.values('author').annotate(
+        count=Count('id')
+    ).order_by().values_list('author', 'count'))
+    UserCounters.objects.bulk_create([
+        UserCounters(
+            user_id=user_id,
+            recipes_count=recipes.get(user_id, 0),
+            followers_count=followers.get(user_id, 0)
+        ) for user_id in User.objects.values_list('id', flat=True).iterator()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('foodgram', '0009_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+                ('recipes_count', models.IntegerField(default=0, verbose_name='количество рецептов')),
+                ('followers_count', models.IntegerField(default=0, verbose_name='количество подписчиков')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.IntegerField(default=0, verbose_name='количество добавлений в избранное'),
+        ),
+        # SQLite добавляет поле, пересоздавая таблицу рецептов,
+        # и теряет триггеры поискового индекса из 0008.
+        migrations.RunPython(
+            recipe_search.create_search_index,
+            migrations.RunPython.noop
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('foodgram', '0010_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='foodgram.Recipe', verbose_name='рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='подписчик')),
+            ],
+            options={
+                'unique_together': {('user', 'recipe')},
+            },
+        ),
+        migrations.RunSQL(
+            [(
+                'INSERT INTO foodgram_feedentry (user_id, recipe_id) '
+                'SELECT subscription.user_id, ranked.id '
+                'FROM foodgram_subscription subscription '
+                'INNER JOIN ('
+                '    SELECT recipe.id, recipe.author_id, '
+                '           ROW_NUMBER() OVER ('
+                '               PARTITION BY recipe.author_id '
+                '               ORDER BY recipe.id DESC'
+                '           ) AS position '
+                '    FROM foodgram_recipe recipe'
+                ') ranked ON ranked.author_id = subscription.author_id '
+                'WHERE ranked.position <= %s '
+                'AND subscription.author_id NOT IN ('
+                '    SELECT counters.user_id '
+                '    FROM foodgram_usercounters counters '
+                '    WHERE counters.followers_count > %s'
+                ')',
+                [settings.FEED_BACKFILL_SIZE,
+                 settings.FEED_FANOUT_MAX_FOLLOWERS]
+            )],
+            migrations.RunSQL.noop
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def pause_popular_authors(apps, schema_editor):
+    UserCounters = apps.get_model('foodgram', 'UserCounters')
+    UserCounters.objects.filter(
+        followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).update(feed_paused=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0011_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercounters',
+            name='feed_paused',
+            field=models.BooleanField(default=False, verbose_name='рецепты подмешиваются в ленты при чтении'),
+        ),
+        migrations.RunPython(pause_popular_authors, migrations.RunPython.noop),
+    ]
@@ -27,6 +27,31 @@ class Tag(models.Model):
         return self.name
 
 
+class UserCounters(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='пользователь'
+    )
+    recipes_count = models.IntegerField(
+        default=0,
+        verbose_name='количество рецептов'
+    )
+    followers_count = models.IntegerField(
+        default=0,
+        verbose_name='количество подписчиков'
+    )
+    feed_paused = models.BooleanField(
+        default=False,
+        verbose_name='рецепты подмешиваются в ленты при чтении'
+    )
+
+    def __str__(self):
+        return str(self.user)
+
+
 class Ingredient(models.Model):
     name = models.CharField(
         max_length=200,
@@ -72,6 +97,18 @@ class Recipe(models.Model):
         validators=(MinValueValidator(1),),
         verbose_name='время приготовления'
     )
+    favorites_count = models.IntegerField(
+        default=0,
+        verbose_name='количество добавлений в избранное'
+    )
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('author', '-id'),
+                name='recipe_author_id_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -108,6 +145,12 @@ class Subscription(models.Model):
 
     class Meta:
         unique_together = ('user', 'author')
+        indexes = (
+            models.Index(
+                fields=('user', '-id'),
+                name='subscription_user_id_idx'
+            ),
+        )
 
 
 class Favorite(models.Model):
@@ -145,3 +188,44 @@ class ShoppingList(models.Model):
 
     class Meta:
         unique_together = ('user', 'recipe')
+
+
+class ShoppingCartIngredient(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+        verbose_name='пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_totals',
+        verbose_name='ингредиент'
+    )
+    amount = models.IntegerField(default=0, verbose_name='количество')
+    recipes_count = models.IntegerField(
+        default=0,
+        verbose_name='количество рецептов'
+    )
+
+    class Meta:
+        unique_together = ('user', 'ingredient')
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='рецепт'
+    )
+
+    class Meta:
+        unique_together = ('user', 'recipe')
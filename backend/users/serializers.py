@@ -3,7 +3,7 @@ from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
-from foodgram.models import Subscription
+from api.cache import user_membership
 
 User = get_user_model()
 
@@ -17,10 +17,8 @@ class CustomUserSerializer(UserSerializer):
         model = User
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return Subscription.objects.filter(user=user, author=obj.id).exists()
+        membership = user_membership.for_request(self.context.get('request'))
+        return obj.id in membership.subscriptions
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):